@@ -0,0 +1,86 @@
+# Run history shared by the benchmarks in this directory.
+#
+# Every benchmark run is appended to a JSON history file as
+#   {"time", "commit", "params", <benchmark fields>, "seconds": {stage: s, "total": s}}
+# and compared with the last run that used the same params, so a regression
+# between commits shows up as a slower stage. The scripts only time their
+# stages and print their own table from the per-stage changes computed here.
+import json, os, subprocess, time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def load_json(path, default=None):
+    if not os.path.exists(path):
+        return default
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_history(path, history):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp = path + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(history, f, indent=1)
+    os.replace(tmp, path)
+
+
+def add_arguments(parser, default_history):
+    parser.add_argument("--repeat", type=int, default=3, help="runs per benchmark; best is kept")
+    parser.add_argument("--history", default=default_history, help="JSON history file")
+    parser.add_argument("--no-history", action="store_true", help="do not record this run")
+    parser.add_argument("--tolerance", type=float, default=0.10,
+                        help="slowdown vs the last comparable run reported as a regression")
+    parser.add_argument("--fail-on-regression", action="store_true",
+                        help="exit with status 1 when a stage regressed")
+
+
+def best_of(runs, stages):
+    # Fastest time of every stage over the runs, plus their total.
+    seconds = {stage: min(run[stage] for run in runs) for stage in stages}
+    seconds["total"] = sum(seconds.values())
+    return seconds
+
+
+def compare(seconds, previous, tolerance):
+    # ({stage: "+4.2%" or ""}, stages slower than `tolerance` allows).
+    changes, regressions = {}, []
+    for stage, secs in seconds.items():
+        changes[stage] = ""
+        if previous is None:
+            continue
+        before = previous["seconds"][stage]
+        delta = (secs - before) / before if before else 0.0
+        changes[stage] = f"{delta:+.1%}"
+        if stage != "total" and delta > tolerance:
+            regressions.append(stage)
+    return changes, regressions
+
+
+def record_run(args, params, seconds, print_report, **fields):
+    # Print this run next to the last comparable one, append it to the
+    # history and return the exit status. print_report(record, changes)
+    # prints the benchmark's own table.
+    record = {"time": time.strftime("%Y-%m-%dT%H:%M:%S"), "commit": git_commit(),
+              "params": params, **fields, "seconds": seconds}
+    history = load_json(args.history, [])
+    previous = next((r for r in reversed(history) if r["params"] == params), None)
+    changes, regressions = compare(seconds, previous, args.tolerance)
+    print_report(record, changes)
+    if previous is not None:
+        print(f"compared with {previous.get('commit') or 'unknown commit'} at {previous['time']}")
+    if not args.no_history:
+        save_history(args.history, history + [record])
+    if regressions:
+        print(f"regression in: {', '.join(regressions)}")
+        if args.fail_on_regression:
+            return 1
+    return 0
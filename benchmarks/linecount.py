@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+# Benchmark the local line-count pipeline (local_mapreduce.py) stage by stage.
+#
+#   python3 benchmarks/linecount.py --files 200 --size 256M --line-length 80
+#   python3 benchmarks/linecount.py --mapper-args=--binary --reducers 4
+#
+# A synthetic corpus of `--files` files totalling `--size` bytes is generated
+# (deterministically, from `--seed`), then the map, shuffle and reduce stages
+# are timed separately; the best of `--repeat` runs is reported as seconds,
+# input lines/sec and MB/sec. Every run is appended to a JSON history file and
+# compared with the last run that used the same parameters (_history.py), so
+# a regression between commits shows up as a slower stage.
+import argparse, json, os, random, shutil, string, sys, tempfile, time
+
+from _history import REPO_ROOT, add_arguments, best_of, load_json, record_run
+
+sys.path.insert(0, REPO_ROOT)
+
+import local_mapreduce  # noqa: E402
+
+STAGES = ("map", "shuffle", "reduce")
+DEFAULT_HISTORY = os.path.join(REPO_ROOT, "benchmarks", "history-linecount.json")
+UNITS = {"": 1, "K": 1 << 10, "M": 1 << 20, "G": 1 << 30}
+
+
+def parse_size(text):
+    # "4096", "64M", "1G" -> bytes
+    text = text.strip().upper().rstrip("IB")
+    unit = text[-1:] if text[-1:] in UNITS else ""
+    return int(float(text[:len(text) - len(unit)]) * UNITS[unit])
+
+
+def generate_corpus(root, files, total_bytes, line_length, seed=0):
+    # Lines are drawn from a fixed pool of random printable lines whose
+    # lengths average `line_length`; returns (lines, bytes) written.
+    rng = random.Random(seed)
+    alphabet = string.ascii_letters + string.digits + " " * 10
+    pool = [("".join(rng.choices(alphabet, k=rng.randint(0, 2 * line_length))) + "\n").encode()
+            for _ in range(4096)]
+    per_file = max(total_bytes // max(files, 1), 1)
+    lines = size = 0
+    os.makedirs(root, exist_ok=True)
+    for i in range(files):
+        written = 0
+        with open(os.path.join(root, f"file-{i:05d}.txt"), "wb") as f:
+            while written < per_file:
+                k = min(1024, max(1, (per_file - written) // (line_length + 1)))
+                chunk = rng.choices(pool, k=k)
+                f.write(b"".join(chunk))
+                written += sum(map(len, chunk))
+                lines += len(chunk)
+        size += written
+    return lines, size
+
+
+def time_pipeline(corpus, args):
+    # One run of the job, returning seconds per stage.
+    inputs = local_mapreduce.list_inputs(corpus)
+    mapper_cmd = f"{args.mapper} {args.mapper_args}".strip()
+    reducer_cmd = f"{args.reducer} {args.reducer_args}".strip()
+    tmp = tempfile.mkdtemp(prefix="bench-linecount-")
+    try:
+        t0 = time.perf_counter()
+        map_outputs = local_mapreduce.run_maps(inputs, mapper_cmd, tmp, args.workers, args.combiner)
+        t1 = time.perf_counter()
+        shuffled = local_mapreduce.shuffle(map_outputs, tmp, args.run_bytes, args.reducers, args.sort)
+        t2 = time.perf_counter()
+        with open(os.devnull, "wb") as out:
+            local_mapreduce.run_reducers(reducer_cmd, shuffled, out, tmp, args.report_format, args.workers)
+        t3 = time.perf_counter()
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+    return {"map": t1 - t0, "shuffle": t2 - t1, "reduce": t3 - t2}
+
+
+def print_report(record, changes):
+    lines, size = record["corpus"]["lines"], record["corpus"]["bytes"]
+    print(f"corpus: {record['params']['files']} files, {lines} lines, {size / 1e6:.1f} MB")
+    print(f"{'stage':<8} {'seconds':>9} {'lines/s':>13} {'MB/s':>9} {'vs last':>9}")
+    for stage in STAGES + ("total",):
+        secs = record["seconds"][stage]
+        print(f"{stage:<8} {secs:>9.3f} {lines / secs if secs else 0:>13,.0f} "
+              f"{size / 1e6 / secs if secs else 0:>9.1f} {changes[stage]:>9}")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the mapper/shuffle/reducer stages.")
+    parser.add_argument("--files", type=int, default=64, help="number of input files")
+    parser.add_argument("--size", type=parse_size, default=parse_size("64M"),
+                        help="total corpus size, e.g. 512M or 2G")
+    parser.add_argument("--line-length", type=int, default=80, help="average line length")
+    parser.add_argument("--seed", type=int, default=0, help="corpus generator seed")
+    parser.add_argument("--corpus", help="keep/reuse the generated corpus in this directory")
+    parser.add_argument("--mapper", default=local_mapreduce.DEFAULT_MAPPER)
+    parser.add_argument("--mapper-args", default="")
+    parser.add_argument("--combiner")
+    parser.add_argument("--reducer", default=local_mapreduce.DEFAULT_REDUCER)
+    parser.add_argument("--reducer-args", default="")
+    parser.add_argument("--report-format", default="counts")
+    parser.add_argument("-r", "--reducers", type=int, default=1)
+    parser.add_argument("-j", "--workers", type=int, default=None)
+    parser.add_argument("--run-bytes", type=int, default=local_mapreduce.shuffle_stage.RUN_BYTES)
+    parser.add_argument("--no-shuffle", dest="sort", action="store_false")
+    add_arguments(parser, DEFAULT_HISTORY)
+    args = parser.parse_args(argv)
+    local_mapreduce.check_merge_order(parser, args)
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    params = {
+        "files": args.files, "size": args.size, "line_length": args.line_length, "seed": args.seed,
+        "mapper_args": args.mapper_args, "combiner": args.combiner, "reducer_args": args.reducer_args,
+        "reducers": args.reducers, "workers": args.workers, "run_bytes": args.run_bytes, "sort": args.sort,
+    }
+    corpus = args.corpus or tempfile.mkdtemp(prefix="bench-corpus-")
+    try:
+        manifest = os.path.join(corpus, ".corpus.json")
+        corpus_params = {k: params[k] for k in ("files", "size", "line_length", "seed")}
+        cached = load_json(manifest, {})
+        if cached.get("params") == corpus_params:
+            stats = cached["stats"]
+        else:
+            lines, size = generate_corpus(corpus, args.files, args.size, args.line_length, args.seed)
+            stats = {"lines": lines, "bytes": size}
+            with open(manifest, "w") as f:
+                json.dump({"params": corpus_params, "stats": stats}, f)
+        runs = [time_pipeline(corpus, args) for _ in range(args.repeat)]
+    finally:
+        if args.corpus is None:
+            shutil.rmtree(corpus, ignore_errors=True)
+
+    return record_run(args, params, best_of(runs, STAGES), print_report, corpus=stats)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+# Benchmark the PhyRe statistics (python/phyre) on synthetic taxonomic trees.
+#
+#   python3 benchmarks/phyre_stats.py --species 100000 --levels 5 --branching 10
+#   python3 benchmarks/phyre_stats.py --branching 3,8,8,12,20 --sample-size 200 -p 200
+#
+# A population master list of `--species` species is generated
+# (deterministically, from `--seed`): every species walks down a random tree
+# with `--branching` children per taxon at each of `--levels` levels, so the
+# shape controls how many taxa each level has. `--samples` sample files of
+# `--sample-size` species are drawn from it. Loading, path lengths, AvTD,
+# VarTD, von Euler's index and the funnel are then timed separately; the best
+# of `--repeat` runs is reported. Every run is appended to a JSON history file
+# and compared with the last run that used the same parameters (_history.py),
+# as benchmarks/linecount.py does.
+import argparse, json, os, random, shutil, sys, tempfile, time
+
+from _history import REPO_ROOT, add_arguments, best_of, load_json, record_run
+
+sys.path.insert(0, os.path.join(REPO_ROOT, "python"))
+
+import phyre  # noqa: E402
+
+STAGES = ("load", "path_lengths", "atd_mean", "atd_variance", "euler", "funnel")
+DEFAULT_HISTORY = os.path.join(REPO_ROOT, "benchmarks", "history-phyre_stats.json")
+
+
+def parse_branching(text):
+    # "10" -> [10]; "3,8,8" -> [3, 8, 8]
+    return [int(b) for b in text.split(",")]
+
+
+def generate_population(path, species, branching, seed=0):
+    # Level l of a species is the path of child indices from the root down
+    # to it, e.g. "L3_4.0.7"; returns (taxon, species names, taxa per level).
+    rng = random.Random(seed)
+    taxon = [f"L{l + 1}" for l in range(len(branching))]
+    names, taxa = [], [set() for _ in taxon]
+    with open(path, "w") as f:
+        f.write("Taxon: " + " ".join(taxon) + "\n")
+        for i in range(species):
+            walk, row = [], []
+            for l, (t, b) in enumerate(zip(taxon, branching)):
+                walk.append(str(rng.randrange(b)))
+                row.append(f"{t}_{'.'.join(walk)}")
+                taxa[l].add(row[-1])
+            names.append(f"sp{i}")
+            f.write(f"sp{i} {' '.join(row)}\n")
+    return taxon, names, [len(t) for t in taxa]
+
+
+def generate_samples(root, names, samples, size, seed=0):
+    rng = random.Random(seed + 1)
+    paths = []
+    for i in range(samples):
+        path = os.path.join(root, f"sample-{i:04d}.txt")
+        with open(path, "w") as f:
+            f.write("\n".join(rng.sample(names, min(size, len(names)))) + "\n")
+        paths.append(path)
+    return paths
+
+
+def time_stages(popfile, sample_files, args):
+    # One pass over every stage, returning seconds per stage.
+    seconds = {}
+    t0 = time.perf_counter()
+    index = phyre.load_population(popfile)
+    seconds["load"] = time.perf_counter() - t0
+    taxon = index.taxon
+    samples = [phyre.load_sample(path) for path in sample_files]
+
+    t0 = time.perf_counter()
+    coef, popN, pathLengths = phyre.path_lengths(index, taxon)
+    seconds["path_lengths"] = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    means = [phyre.atd_mean(index, sample, taxon, coef) for sample in samples]
+    seconds["atd_mean"] = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    for sample, (atd, taxonN, _) in zip(samples, means):
+        phyre.atd_variance(taxonN, sample, atd, taxon, coef)
+    seconds["atd_variance"] = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    for sample, (atd, _, Taxon) in zip(samples, means):
+        phyre.euler(sample, Taxon, atd, taxon, coef)
+    seconds["euler"] = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    phyre.funnel(index, taxon, coef, args.p, args.d1, args.d2, seed=args.seed,
+                 workers=args.workers, method=args.method)
+    seconds["funnel"] = time.perf_counter() - t0
+    return seconds
+
+
+def stage_calls(params):
+    # How many times each stage's function runs per pass, for the per-call column.
+    dims = params["d2"] - params["d1"] + 1
+    samples = params["samples"]
+    return {"load": 1, "path_lengths": 1, "atd_mean": samples, "atd_variance": samples,
+            "euler": samples, "funnel": dims * params["p"]}
+
+
+def print_report(record, changes):
+    params, shape = record["params"], record["shape"]
+    print(f"population: {params['species']} species, taxa per level {shape['taxa']}; "
+          f"{params['samples']} samples of {params['sample_size']}; "
+          f"funnel d={params['d1']}..{params['d2']} p={params['p']} ({params['method']})")
+    calls = stage_calls(params)
+    print(f"{'stage':<13} {'seconds':>9} {'calls':>8} {'us/call':>11} {'vs last':>9}")
+    for stage in STAGES + ("total",):
+        secs = record["seconds"][stage]
+        n = calls.get(stage)
+        per_call = f"{secs / n * 1e6:,.1f}" if n else ""
+        print(f"{stage:<13} {secs:>9.3f} {n or '':>8} {per_call:>11} {changes[stage]:>9}")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the PhyRe statistics stage by stage.")
+    parser.add_argument("--species", type=int, default=100000, help="population size")
+    parser.add_argument("--levels", type=int, default=5, help="taxonomic levels")
+    parser.add_argument("--branching", type=parse_branching, default=[10],
+                        help="children per taxon: one value, or one per level (3,8,8,...)")
+    parser.add_argument("--samples", type=int, default=20, help="number of sample files")
+    parser.add_argument("--sample-size", type=int, default=100, help="species per sample")
+    parser.add_argument("-p", type=int, default=100, help="funnel permutations per dimension")
+    parser.add_argument("--d1", type=int, default=10, help="smallest funnel dimension")
+    parser.add_argument("--d2", type=int, default=70, help="largest funnel dimension")
+    parser.add_argument("--method", default="scalar", help="funnel method (scalar or batched)")
+    parser.add_argument("-j", "--workers", type=int, default=1, help="funnel worker processes")
+    parser.add_argument("--seed", type=int, default=0, help="generator and funnel seed")
+    parser.add_argument("--data", help="keep/reuse the generated files in this directory")
+    add_arguments(parser, DEFAULT_HISTORY)
+    args = parser.parse_args(argv)
+    if len(args.branching) == 1:
+        args.branching *= args.levels
+    elif len(args.branching) != args.levels:
+        parser.error("--branching needs one value or one per level")
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    params = {
+        "species": args.species, "branching": args.branching, "samples": args.samples,
+        "sample_size": args.sample_size, "p": args.p, "d1": args.d1, "d2": args.d2,
+        "method": args.method, "workers": args.workers, "seed": args.seed,
+    }
+    data = args.data or tempfile.mkdtemp(prefix="bench-phyre-")
+    try:
+        manifest = os.path.join(data, ".population.json")
+        data_params = {k: params[k] for k in ("species", "branching", "samples", "sample_size", "seed")}
+        cached = load_json(manifest, {})
+        popfile = os.path.join(data, "population.txt")
+        if cached.get("params") == data_params:
+            shape, sample_files = cached["shape"], cached["samples"]
+        else:
+            os.makedirs(data, exist_ok=True)
+            taxon, names, taxa = generate_population(popfile, args.species, args.branching, args.seed)
+            sample_files = generate_samples(data, names, args.samples, args.sample_size, args.seed)
+            shape = {"taxon": taxon, "taxa": taxa}
+            with open(manifest, "w") as f:
+                json.dump({"params": data_params, "shape": shape, "samples": sample_files}, f)
+        runs = [time_stages(popfile, sample_files, args) for _ in range(args.repeat)]
+    finally:
+        if args.data is None:
+            shutil.rmtree(data, ignore_errors=True)
+
+    return record_run(args, params, best_of(runs, STAGES), print_report, shape=shape)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+# Run mapper.py / reducer.py on one machine the way the Dataproc Hadoop
+# Streaming job in the Jenkinsfile does:
+#
+#   map     one mapper process per input file, stdin = file contents,
+#           mapreduce_map_input_file = file path, run `--workers` at a time;
+#           with `--combiner` its sorted output goes through the combiner
+#   shuffle partition records by key across `--reducers` (shuffle.partition)
+#           and external merge sort each partition by key (shuffle.py)
+#   reduce  one reducer process per partition; with several reducers the
+#           sorted part-* outputs are k-way merged into one report
+#
+#   python3 local_mapreduce.py data/ -o line_counts.txt --mapper-args=--binary
+#
+# `--decompress` lets mapper.py detect and stream-decompress .gz/.bz2/.xz/.zst
+# inputs by their magic bytes; plain files pass through untouched.
+#
+# With `--no-shuffle` the map outputs are just concatenated, which is only
+# correct for a reducer that does not need sorted input (reducer.py --hash).
+# Several reducers need key-sorted part-* files to merge, so `--reducers N`
+# rejects `--no-shuffle` and a `--hash` reducer without `--sort`.
+import argparse, os, shlex, shutil, subprocess, sys, tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+import merge_parts
+import shuffle as shuffle_stage
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_MAPPER = f"{shlex.quote(sys.executable)} {shlex.quote(os.path.join(HERE, 'mapper.py'))}"
+DEFAULT_REDUCER = f"{shlex.quote(sys.executable)} {shlex.quote(os.path.join(HERE, 'reducer.py'))}"
+
+
+def list_inputs(input_dir):
+    # Like `-input dir/*`: regular files directly under input_dir, minus the
+    # "_"/"." names Hadoop's FileInputFormat treats as hidden.
+    with os.scandir(input_dir) as entries:
+        return sorted(e.path for e in entries if e.is_file() and e.name[:1] not in "._")
+
+
+def run_mapper(cmd, input_path, output_path, combiner_cmd=None):
+    env = dict(os.environ, mapreduce_map_input_file=os.path.abspath(input_path))
+    raw_path = output_path + ".raw" if combiner_cmd else output_path
+    with open(input_path, "rb") as src, open(raw_path, "wb") as dst:
+        subprocess.run(cmd, stdin=src, stdout=dst, env=env, check=True)
+    if combiner_cmd:
+        # Like Hadoop: the combiner sees the task's output sorted by key.
+        sorted_path = sort_files([raw_path], output_path + ".sorted")
+        with open(sorted_path, "rb") as src, open(output_path, "wb") as dst:
+            subprocess.run(combiner_cmd, stdin=src, stdout=dst, env=env, check=True)
+        os.remove(raw_path)
+        os.remove(sorted_path)
+    return output_path
+
+
+def run_maps(inputs, mapper_cmd, workdir, workers=None, combiner_cmd=None):
+    # Every mapper is its own python3 process; the thread pool only bounds
+    # how many of them run at once.
+    cmd = shlex.split(mapper_cmd)
+    combine = shlex.split(combiner_cmd) if combiner_cmd else None
+    workers = workers or os.cpu_count() or 1
+    outputs = [os.path.join(workdir, f"map-{i:05d}") for i in range(len(inputs))]
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(run_mapper, [cmd] * len(inputs), inputs, outputs,
+                             [combine] * len(inputs)))
+
+
+def sort_files(paths, output_path, run_bytes=shuffle_stage.RUN_BYTES):
+    # Group equal keys next to each other with bounded memory: sorted runs
+    # are spilled next to output_path and k-way merged.
+    files = [open(path, "rb") for path in paths]
+    try:
+        with open(output_path, "wb") as out:
+            shuffle_stage.external_sort(files, out, os.path.dirname(output_path), run_bytes)
+    finally:
+        for f in files:
+            f.close()
+    return output_path
+
+
+def concatenate(paths, output_path):
+    with open(output_path, "wb") as out:
+        for path in paths:
+            with open(path, "rb") as f:
+                shutil.copyfileobj(f, out)
+    return output_path
+
+
+def split_partitions(paths, output_paths):
+    # Route every record to its reducer's file by shuffle.partition(key).
+    outs = [open(path, "wb") for path in output_paths]
+    try:
+        for path in paths:
+            with open(path, "rb") as f:
+                for line in f:
+                    if not line.endswith(b"\n"):
+                        line += b"\n"
+                    outs[shuffle_stage.partition(shuffle_stage.record_key(line), len(outs))].write(line)
+    finally:
+        for f in outs:
+            f.close()
+    return output_paths
+
+
+def shuffle(map_outputs, workdir, run_bytes=shuffle_stage.RUN_BYTES, reducers=1, sort=True):
+    # Returns one input file per reducer.
+    outputs = [os.path.join(workdir, f"shuffle-{r:05d}") for r in range(reducers)]
+    if reducers > 1:
+        map_outputs = split_partitions(map_outputs, [path + ".part" for path in outputs])
+    for output in outputs:
+        paths = [output + ".part"] if reducers > 1 else map_outputs
+        if sort:
+            sort_files(paths, output, run_bytes)
+        else:
+            concatenate(paths, output)
+        if reducers > 1:
+            os.remove(output + ".part")
+    return outputs
+
+
+def run_reducer(reducer_cmd, input_path, out):
+    with open(input_path, "rb") as src:
+        subprocess.run(shlex.split(reducer_cmd), stdin=src, stdout=out, check=True)
+
+
+def run_reducers(reducer_cmd, inputs, out, workdir, report_format="counts", workers=None):
+    # A single reducer writes the report itself. Several reducers write
+    # part-* files in parallel, merged afterwards like merge_parts.py does.
+    if len(inputs) == 1:
+        run_reducer(reducer_cmd, inputs[0], out)
+        return
+    parts = [os.path.join(workdir, f"part-{r:05d}") for r in range(len(inputs))]
+
+    def reduce_one(input_path, part):
+        with open(part, "wb") as f:
+            run_reducer(reducer_cmd, input_path, f)
+
+    with ThreadPoolExecutor(max_workers=workers or os.cpu_count() or 1) as pool:
+        list(pool.map(reduce_one, inputs, parts))
+    merge_parts.merge(parts, out, report_format)
+
+
+def run_job(input_dir, out, mapper_cmd=DEFAULT_MAPPER, reducer_cmd=DEFAULT_REDUCER,
+            workers=None, workdir=None, run_bytes=shuffle_stage.RUN_BYTES, sort=True,
+            combiner_cmd=None, reducers=1, report_format="counts"):
+    inputs = list_inputs(input_dir)
+    tmp = workdir or tempfile.mkdtemp(prefix="local-mapreduce-")
+    try:
+        map_outputs = run_maps(inputs, mapper_cmd, tmp, workers, combiner_cmd)
+        shuffled = shuffle(map_outputs, tmp, run_bytes, reducers, sort)
+        run_reducers(reducer_cmd, shuffled, out, tmp, report_format, workers)
+    finally:
+        if workdir is None:
+            shutil.rmtree(tmp, ignore_errors=True)
+
+
+def check_merge_order(parser, args):
+    # merge_parts.merge() k-way merges the part-* files, which is only right
+    # when every reducer writes its keys in sorted order.
+    if args.reducers <= 1:
+        return
+    if not args.sort:
+        parser.error("--no-shuffle needs --reducers 1: the part-* files would not be sorted")
+    words = shlex.split(f"{args.reducer} {args.reducer_args}")
+    if "--hash" in words and "--sort" not in words:
+        parser.error("a --hash reducer needs --sort with --reducers > 1, "
+                     "e.g. --reducer-args='--hash --sort'")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Run the line-count job locally.")
+    parser.add_argument("input_dir", help="directory whose files are the job input")
+    parser.add_argument("-o", "--output", help="write reducer output here instead of stdout")
+    parser.add_argument("--mapper", default=DEFAULT_MAPPER, help="mapper command line")
+    parser.add_argument("--mapper-args", default="", help="extra flags appended to --mapper")
+    parser.add_argument("--decompress", action="store_true",
+                        help="pass --decompress to mapper.py for compressed inputs")
+    parser.add_argument("--combiner", help="combiner command line, e.g. 'python3 reducer.py --combine'")
+    parser.add_argument("--reducer", default=DEFAULT_REDUCER, help="reducer command line")
+    parser.add_argument("--reducer-args", default="", help="extra flags appended to --reducer")
+    parser.add_argument("-r", "--reducers", type=int, default=1, help="number of reduce partitions")
+    parser.add_argument("--report-format", choices=sorted(merge_parts.KEYS), default="counts",
+                        help="reducer output format, used to merge several part-* files")
+    parser.add_argument("-j", "--workers", type=int, default=None,
+                        help="concurrent mapper processes (default: CPU count)")
+    parser.add_argument("--workdir", help="keep intermediate files in this directory")
+    parser.add_argument("--run-bytes", type=int, default=shuffle_stage.RUN_BYTES,
+                        help="shuffle memory per sorted run before spilling to disk")
+    parser.add_argument("--no-shuffle", dest="sort", action="store_false",
+                        help="skip sorting; only for reducers run with --hash")
+    args = parser.parse_args(argv)
+    check_merge_order(parser, args)
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    mapper_cmd = f"{args.mapper} {args.mapper_args}".strip()
+    if args.decompress:
+        mapper_cmd += " --decompress"
+    reducer_cmd = f"{args.reducer} {args.reducer_args}".strip()
+    if args.workdir:
+        os.makedirs(args.workdir, exist_ok=True)
+    if args.output:
+        with open(args.output, "wb") as out:
+            run_job(args.input_dir, out, mapper_cmd, reducer_cmd,
+                    args.workers, args.workdir, args.run_bytes, args.sort, args.combiner,
+                    args.reducers, args.report_format)
+    else:
+        run_job(args.input_dir, sys.stdout.buffer, mapper_cmd, reducer_cmd,
+                args.workers, args.workdir, args.run_bytes, args.sort, args.combiner,
+                args.reducers, args.report_format)
+
+
+if __name__ == "__main__":
+    main()
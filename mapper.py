@@ -1,12 +1,249 @@
 #!/usr/bin/env python3
-import os, sys
+import argparse, bz2, gzip, io, lzma, os, re, sys
 
-# Hadoop Streaming exposes the current input file path via an env var.
-# Try modern then legacy names:
-path = os.environ.get("mapreduce_map_input_file") or os.environ.get("map_input_file") or ""
-fname = os.path.basename(path) or "UNKNOWN"
+try:  # Python 3.14+
+    from compression import zstd
+except ImportError:
+    zstd = None
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
 
-quoted = f"\"{fname}\""  # e.g., "myfile.py"
-for _ in sys.stdin:
-    # one count per input line
-    print(f"{quoted}\t1")
\ No newline at end of file
+BLOCK_SIZE = 4 << 20  # 4 MiB reads for the --binary fast path
+
+# --decompress: codecs recognised by their leading magic bytes
+MAGIC = (
+    (b"\x1f\x8b", "gzip"),
+    (b"BZh", "bz2"),
+    (b"\xfd7zXZ\x00", "xz"),
+    (b"\x28\xb5\x2f\xfd", "zstd"),
+)
+SUFFIXES = (".gz", ".bz2", ".xz", ".zst")
+
+# --stats record layout, see reducer.STAT_FIELDS:
+#   lines, bytes, nonblank, max_line (bytes, without the line break),
+#   defs, classes (only counted for *.py files)
+BLANK = b" \t\f\v"
+DEF_RE = re.compile(rb"[ \t]*(?:async[ \t]+)?def[ \t]")
+CLASS_RE = re.compile(rb"[ \t]*class[ \t]")
+
+
+def input_key(environ=os.environ):
+    # Hadoop Streaming exposes the current input file path via an env var.
+    # Try modern then legacy names:
+    path = environ.get("mapreduce_map_input_file") or environ.get("map_input_file") or ""
+    fname = os.path.basename(path) or "UNKNOWN"
+    return f"\"{fname}\""  # e.g., "myfile.py"
+
+
+def detect_codec(head):
+    for magic, codec in MAGIC:
+        if head.startswith(magic):
+            return codec
+    return None
+
+
+class Prefixed(io.RawIOBase):
+    # `head`, already read from `stream`, followed by the rest of `stream`.
+
+    def __init__(self, head, stream):
+        self.head = head
+        self.stream = stream
+
+    def readable(self):
+        return True
+
+    def readinto(self, b):
+        data = self.head[:len(b)] if self.head else self.stream.read1(len(b))
+        self.head = self.head[len(data):]
+        b[:len(data)] = data
+        return len(data)
+
+
+def read_head(stream, size=8):
+    # peek() returns whatever one read gave, which on a pipe can be shorter
+    # than a magic number: keep reading until `size` bytes or EOF.
+    head = stream.peek(size)[:size]
+    if len(head) >= size:
+        return head, stream
+    head = b""
+    while len(head) < size:
+        chunk = stream.read1(size - len(head))
+        if not chunk:
+            break
+        head += chunk
+    return head, io.BufferedReader(Prefixed(head, stream))
+
+
+def open_input(stream):
+    # Sniff the magic bytes (stream is a buffered binary reader such as
+    # sys.stdin.buffer; read_head hands back a stream that still starts with
+    # them) and wrap compressed input in a streaming decompressor, so memory
+    # stays bounded by the read size.
+    head, stream = read_head(stream)
+    codec = detect_codec(head)
+    if codec == "gzip":
+        return gzip.GzipFile(fileobj=stream, mode="rb")
+    if codec == "bz2":
+        return bz2.BZ2File(stream)
+    if codec == "xz":
+        return lzma.LZMAFile(stream)
+    if codec == "zstd":
+        if zstd is not None:
+            return zstd.ZstdFile(stream)
+        if zstandard is not None:
+            return zstandard.ZstdDecompressor().stream_reader(stream, read_across_frames=True)
+        sys.exit("mapper.py: zstd input needs Python 3.14+ or the zstandard package")
+    return stream
+
+
+def is_python(key):
+    name = key.strip('"')
+    for suffix in SUFFIXES:
+        if name.endswith(suffix):
+            name = name[:-len(suffix)]
+            break
+    return name.endswith(".py")
+
+
+class Combiner:
+    # In-mapper combining: keep per-key counts in memory and emit one
+    # "<key>\t<n>" record per key instead of one record per line.
+    # The buffer is flushed once it holds `max_keys` distinct keys and
+    # again at end of input, so memory stays bounded.
+
+    def __init__(self, out, max_keys=10000):
+        self.out = out
+        self.max_keys = max_keys
+        self.counts = {}
+
+    def add(self, key, n=1):
+        if key in self.counts:
+            self.counts[key] += n
+            return
+        if len(self.counts) >= self.max_keys:
+            self.flush()
+        self.counts[key] = n
+
+    def flush(self):
+        for key, n in self.counts.items():
+            self.out.write(f"{key}\t{n}\n")
+        self.counts.clear()
+
+
+def map_lines(stream, key):
+    for _ in stream:
+        # one count per input line
+        print(f"{key}\t1")
+
+
+def map_combined(stream, key, combiner):
+    n = 0
+    for _ in stream:
+        n += 1
+    if n:
+        # empty splits emit nothing, exactly like the per-line mode
+        combiner.add(key, n)
+
+
+def count_lines(stream, block_size=BLOCK_SIZE):
+    # Count lines the way iterating sys.stdin does (only "\n" ends a line;
+    # "\r\n" is one line, a lone "\r" is not a break) without decoding
+    # anything: read fixed-size binary blocks and let bytes.count do the
+    # scanning.
+    n = 0
+    last = b""
+    while True:
+        block = stream.read(block_size)
+        if not block:
+            break
+        n += block.count(b"\n")
+        last = block[-1:]
+    if last and last != b"\n":
+        n += 1  # trailing line without a newline
+    return n
+
+
+def map_binary(stream, key, combiner, block_size=BLOCK_SIZE):
+    n = count_lines(stream, block_size)
+    if n:
+        combiner.add(key, n)
+
+
+def file_stats(stream, python=False):
+    # One pass over the raw bytes. Iterating a binary stream splits on b"\n"
+    # only, like sys.stdin and the line counters, and len() is the byte
+    # length of each line.
+    lines = size = nonblank = max_line = defs = classes = 0
+    for line in stream:
+        lines += 1
+        size += len(line)
+        if line.endswith(b"\r\n"):
+            body = line[:-2]
+        elif line.endswith(b"\n"):
+            body = line[:-1]
+        else:
+            body = line
+        if len(body) > max_line:
+            max_line = len(body)
+        if body.strip(BLANK):
+            nonblank += 1
+            if python:
+                if DEF_RE.match(body):
+                    defs += 1
+                elif CLASS_RE.match(body):
+                    classes += 1
+    return lines, size, nonblank, max_line, defs, classes
+
+
+def map_stats(stream, key, out):
+    stats = file_stats(stream, python=is_python(key))
+    if stats[0]:
+        out.write(key + "\t" + "\t".join(map(str, stats)) + "\n")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Line-count mapper for Hadoop Streaming.")
+    parser.add_argument("--combine", action="store_true",
+                        help="aggregate counts in the mapper and emit one record per file")
+    parser.add_argument("--max-keys", type=int, default=10000,
+                        help="flush the in-mapper buffer after this many distinct keys")
+    parser.add_argument("--binary", action="store_true",
+                        help="count newlines in raw stdin blocks (implies --combine)")
+    parser.add_argument("--block-size", type=int, default=BLOCK_SIZE,
+                        help="read size in bytes for --binary")
+    parser.add_argument("--decompress", action="store_true",
+                        help="stream-decompress gzip/bz2/xz/zstd input detected by magic bytes")
+    parser.add_argument("--stats", action="store_true",
+                        help="emit one multi-metric record per file (pair with reducer.py --stats)")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    key = input_key()
+    raw, text = sys.stdin.buffer, sys.stdin
+    if args.decompress:
+        raw = open_input(sys.stdin.buffer)
+        if raw is not sys.stdin.buffer:
+            # newline="\n" like sys.stdin on POSIX, so compressing a file
+            # does not change its count
+            text = io.TextIOWrapper(raw, encoding=sys.stdin.encoding, errors=sys.stdin.errors,
+                                    newline="\n")
+    if args.stats:
+        map_stats(raw, key, sys.stdout)
+        return
+    if not (args.combine or args.binary):
+        map_lines(text, key)
+        return
+    combiner = Combiner(sys.stdout, args.max_keys)
+    if args.binary:
+        map_binary(raw, key, combiner, args.block_size)
+    else:
+        map_combined(text, key, combiner)
+    combiner.flush()
+
+
+if __name__ == "__main__":
+    main()
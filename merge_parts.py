@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+# Merge the part-* files of a multi-reducer line-count job into one report
+# sorted by key. Every reducer already emits its keys in sorted order, so a
+# k-way merge of the parts is enough: the job inputs are never reread.
+#
+#   python3 merge_parts.py out/part-* > line_counts.txt
+#   python3 merge_parts.py --format tsv out/part-*   # reducer.py --stats
+import argparse, glob, heapq, json, os, sys
+
+import reducer
+
+TSV_HEADER = "\t".join(("file",) + reducer.STAT_FIELDS).encode()
+
+
+# The keys below reproduce the order the reducers sorted on: the quoted
+# mapper key, e.g. b'"myfile.py"', compared as raw bytes like Hadoop does.
+def counts_key(line):
+    return line.rpartition(b": ")[0]
+
+
+def tsv_key(line):
+    return b'"' + line.split(b"\t", 1)[0] + b'"'
+
+
+def json_key(line):
+    return b'"' + json.loads(line)["file"].encode() + b'"'
+
+
+KEYS = {"counts": counts_key, "tsv": tsv_key, "json": json_key}
+
+
+def part_paths(paths):
+    # Directories stand for their part-* files, as in Hadoop's output dir.
+    result = []
+    for path in paths:
+        if os.path.isdir(path):
+            result.extend(sorted(glob.glob(os.path.join(path, "part-*"))))
+        else:
+            result.append(path)
+    return result
+
+
+def records(f, header):
+    for line in f:
+        if not line.endswith(b"\n"):
+            line += b"\n"
+        if header is not None and line.rstrip(b"\n") == header:
+            continue
+        yield line
+
+
+def merge(paths, out, fmt="counts"):
+    header = TSV_HEADER if fmt == "tsv" else None
+    files = [open(path, "rb") for path in part_paths(paths)]
+    try:
+        if header is not None and any(f.readline().rstrip(b"\n") == header for f in files):
+            out.write(header + b"\n")
+        for f in files:
+            f.seek(0)
+        out.writelines(heapq.merge(*(records(f, header) for f in files), key=KEYS[fmt]))
+    finally:
+        for f in files:
+            f.close()
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Merge sorted reducer part-* files.")
+    parser.add_argument("parts", nargs="+", help="part files or job output directories")
+    parser.add_argument("--format", choices=sorted(KEYS), default="counts",
+                        help="reducer output format: default counts, or --stats tsv/json")
+    parser.add_argument("-o", "--output", help="write the report here instead of stdout")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.output:
+        with open(args.output, "wb") as out:
+            merge(args.parts, out, args.format)
+    else:
+        merge(args.parts, sys.stdout.buffer, args.format)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,25 +1,213 @@
-from multiprocessing import Process
+"""Match IPv4 addresses against a list of CIDR networks.
 
-def split_list(alist, wanted_parts=1):
-    length = len(alist)
-    return [alist[i * length // wanted_parts: (i + 1) * length // wanted_parts] for i in range(wanted_parts)]
+Every IP used to be tested against every mask in ``masklist``, which is
+O(ips x masks). Here ``masklist`` is compiled once into a ``NetworkTable``:
+CIDR blocks are either nested or disjoint, so the address space splits into
+sorted, non-overlapping intervals, each labelled with the most specific
+network covering it (or none). A lookup is one binary search over the
+interval starts, O(log masks) per address, and answers both "is the
+address in any network" and "which is its longest matching prefix".
+
+With numpy, ``parse_addresses`` turns millions of addresses into a uint32
+array at once and ``NetworkTable.label_many`` / ``contains_many`` resolve
+the whole batch with ``np.searchsorted``; large tables first look addresses
+up in a per-/24 directory and only search the blocks that intervals split.
+numpy is optional: without it only the per-address lookups are available.
+"""
+
+import socket
+from bisect import bisect_right
+from ipaddress import IPv4Network
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+else:
+    RECORD_SEPARATORS = np.array([ord(".")] * 3 + [ord("\n")], np.uint8)
+
+ADDRESS_SPACE = 1 << 32
+DIRECTORY_MIN = 1 << 16  # intervals from which bulk queries use a /24 directory
+
+
+def ip_to_int(address):
+    """``"a.b.c.d"`` as an integer; ValueError for anything else."""
+    try:
+        return int.from_bytes(socket.inet_pton(socket.AF_INET, address.strip()), "big")
+    except OSError:
+        raise ValueError(f"not an IPv4 address: {address!r}") from None
+
+
+def int_to_ip(value):
+    return socket.inet_ntoa(value.to_bytes(4, "big"))
+
+
+def _split_lines(addresses):
+    if isinstance(addresses, (bytes, bytearray, memoryview)):
+        return bytes(addresses).decode("ascii").splitlines()
+    return addresses
+
+
+def parse_addresses(addresses):
+    """uint32 array of a batch of dotted-quad addresses (numpy only).
+
+    ``addresses`` is a sequence of strings, or bytes holding one address per
+    line, e.g. a log column read straight from disk. All the text is parsed
+    in a few whole-array passes. Input the vectorised parser does not accept
+    (surrounding whitespace, blank lines...) falls back to ``ip_to_int`` per
+    address, which raises ValueError on the first invalid one.
+    """
+    if np is None:
+        raise ImportError("bulk address parsing needs numpy")
+    if isinstance(addresses, np.ndarray) and addresses.dtype.kind in "ui":
+        return addresses.astype(np.uint32)
+    if isinstance(addresses, (bytes, bytearray, memoryview)):
+        data = bytes(addresses)
+        if data and not data.endswith(b"\n"):
+            data += b"\n"
+    else:
+        data = ("\n".join(addresses) + "\n").encode("ascii") if len(addresses) else b""
+    values = _parse_dotted(np.frombuffer(data, np.uint8))
+    if values is None:
+        return np.fromiter((ip_to_int(a) for a in _split_lines(addresses)), np.uint32)
+    return values
+
+
+def _parse_dotted(buf):
+    # "a.b.c.d\n" records -> uint32, or None if anything is off. Every
+    # non-digit byte must be a separator, in the order . . . \n per record.
+    d = buf - np.uint8(ord("0"))
+    ends = np.flatnonzero(d > 9)
+    if len(ends) % 4 or not (buf[ends].reshape(-1, 4) == RECORD_SEPARATORS).all():
+        return None
+    length = np.diff(ends, prepend=-1) - 1
+    if ((length < 1) | (length > 3)).any():
+        return None
+    # digits right to left; places a short field lacks are masked out
+    octets = d[ends - 1].astype(np.uint16)
+    octets += np.where(length >= 2, d[ends - 2] * np.uint16(10), 0)
+    octets += np.where(length >= 3, d[ends - 3] * np.uint16(100), 0)
+    if (octets > 255).any() or ((length > 1) & (d[ends - length] == 0)).any():
+        return None
+    octets = octets.astype(np.uint32).reshape(-1, 4)
+    return octets[:, 0] << 24 | octets[:, 1] << 16 | octets[:, 2] << 8 | octets[:, 3]
 
-def check_ip(iplist, masklist):
-    threads = 16
-    workList = {}
 
-    workList[0], workList[1], workList[2], workList[3], \
-    workList[4], workList[5], workList[6], workList[7], \
-    workList[8], workList[9], workList[10], workList[11], \
-    workList[12], workList[13], workList[14], \
-    workList[15] = split_list(iplist, 16)
+def parse_network(mask):
+    """``(first address, prefix length)`` of ``"a.b.c.d/len"`` or a bare address.
 
-    processes = [
-        Process(target=include_worker, args=(workList[i], masklist)) for i
-        in range(0, threads)]
+    Host bits are ignored, as with ``ip_network(mask, strict=False)``; other
+    spellings such as ``"a.b.c.d/255.255.0.0"`` go through ``ipaddress``.
+    """
+    address, _, prefix = mask.strip().partition("/")
+    try:
+        length = int(prefix) if prefix else 32
+        if not 0 <= length <= 32:
+            raise ValueError
+        first = ip_to_int(address)
+    except ValueError:
+        network = IPv4Network(mask.strip(), strict=False)
+        return int(network.network_address), network.prefixlen
+    return first & (ADDRESS_SPACE - 1 << 32 - length), length
 
-    for p in processes:
-        p.start()
 
-    for p in processes:
-        p.join()
+class NetworkTable:
+    """Interval table compiled from a list of CIDR networks."""
+
+    def __init__(self, masklist):
+        networks = sorted({parse_network(mask) for mask in masklist})
+        self.networks = [f"{int_to_ip(first)}/{length}" for first, length in networks]
+        self.starts = []
+        self.labels = []
+        self._np = None
+        # Sorted by (first, length), every network comes after the ones
+        # enclosing it; the stack holds the enclosing networks still open.
+        stack = []
+        for label, (first, length) in enumerate(networks):
+            while stack and stack[-1][0] < first:
+                self._close(stack)
+            self._mark(first, label)
+            stack.append((first + (1 << 32 - length) - 1, label))
+        while stack:
+            self._close(stack)
+
+    def _close(self, stack):
+        last, _ = stack.pop()
+        if last + 1 < ADDRESS_SPACE:
+            self._mark(last + 1, stack[-1][1] if stack else -1)
+
+    def _mark(self, start, label):
+        # From `start` on, addresses belong to network `label` (-1: none).
+        if self.starts and self.starts[-1] == start:
+            self.starts.pop()
+            self.labels.pop()
+        if (self.labels[-1] if self.labels else -1) == label:
+            return
+        self.starts.append(start)
+        self.labels.append(label)
+
+    def __len__(self):
+        return len(self.networks)
+
+    def label(self, address):
+        """Index in ``networks`` of the longest prefix containing ``address``, or -1."""
+        value = address if isinstance(address, int) else ip_to_int(address)
+        i = bisect_right(self.starts, value) - 1
+        return self.labels[i] if i >= 0 else -1
+
+    def lookup(self, address):
+        """Longest matching network of ``address`` as ``"a.b.c.d/len"``, or None."""
+        label = self.label(address)
+        return self.networks[label] if label >= 0 else None
+
+    def __contains__(self, address):
+        return self.label(address) >= 0
+
+    def _arrays(self):
+        # numpy copies of the table, built on the first bulk query. Large
+        # tables also get a directory with the label of every /24 block that
+        # lies inside a single interval (-2 for blocks an interval starts
+        # in), so most addresses are resolved by one array lookup.
+        if self._np is None:
+            starts = np.array(self.starts, np.uint32)
+            labels = np.array(self.labels, np.int32)
+            directory = None
+            if len(starts) >= DIRECTORY_MIN:
+                blocks = np.arange(1 << 24, dtype=np.uint32) << 8
+                directory = self._search(starts, labels, blocks)
+                directory[starts[starts & 255 != 0] >> 8] = -2
+            self._np = starts, labels, directory
+        return self._np
+
+    @staticmethod
+    def _search(starts, labels, values):
+        i = np.searchsorted(starts, values, side="right") - 1
+        return np.where(i >= 0, labels[i], -1).astype(np.int32)
+
+    def label_many(self, addresses):
+        """``label`` of every address in a batch, as an int32 array (numpy only).
+
+        ``addresses`` is anything ``parse_addresses`` accepts, or an integer array.
+        """
+        values = parse_addresses(addresses)
+        starts, labels, directory = self._arrays()
+        if not len(starts):
+            return np.full(len(values), -1, np.int32)
+        if directory is None:
+            return self._search(starts, labels, values)
+        result = directory[values >> 8]
+        split = np.flatnonzero(result == -2)
+        result[split] = self._search(starts, labels, values[split])
+        return result
+
+    def contains_many(self, addresses):
+        """Boolean array: which addresses of a batch are in any network (numpy only)."""
+        return self.label_many(addresses) >= 0
+
+
+def check_ip(iplist, masklist):
+    """The addresses of ``iplist`` that fall in any network of ``masklist``."""
+    table = NetworkTable(masklist)
+    if np is not None and len(iplist):
+        return [ip for ip, hit in zip(iplist, table.contains_many(iplist).tolist()) if hit]
+    return [ip for ip in iplist if ip in table]
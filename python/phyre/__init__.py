@@ -0,0 +1,32 @@
+"""Taxonomic distinctness engine behind PhyRe.py.
+
+PhyRe.py keeps its populations in nested ``population[species][level]``
+dicts and recounts them on every call; the modules here compute the same
+statistics from integer-encoded taxonomic levels. Everything is importable
+without side effects, so one process can run many analyses::
+
+    import phyre
+    index = phyre.load_population("population.txt")
+    coef, popN, pathLengths = phyre.path_lengths(index, index.taxon)
+    atd, taxonN, Taxon = phyre.atd_mean(index, sample, index.taxon, coef)
+
+``phyre.cli`` is PhyRe.py's command line on top of these functions.
+"""
+
+from .distinctness import atd_mean, atd_variance
+from .imbalance import euler
+from .funnels import funnel
+from .index import PopulationIndex
+from .loader import load_population, load_sample
+from .pathlength import path_lengths
+
+__all__ = [
+    "PopulationIndex",
+    "atd_mean",
+    "atd_variance",
+    "euler",
+    "funnel",
+    "load_population",
+    "load_sample",
+    "path_lengths",
+]
@@ -0,0 +1,140 @@
+"""Batch evaluation of many PhyRe sample files against one population.
+
+The population is loaded and indexed once. Sample files are then evaluated
+in a process pool whose workers receive the ``PopulationIndex`` through the
+pool initializer. The pool is started with ``fork`` where the platform has
+it (``index.fork_context``), so workers share the parent's copy of the index
+copy-on-write, and the bulk of it lives in flat ``array('i')`` buffers that
+reference counting never touches. Without ``fork`` the index is pickled into
+every worker once.
+
+    python -m phyre.batch population.txt samples/*.txt -j 8 --json results.json
+    python -m phyre.batch population.txt --list samples.lst --csv results.csv
+"""
+
+import argparse
+import os
+import sys
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+
+from . import distinctness, loader, report
+from .imbalance import euler
+from .index import fork_context
+from .pathlength import path_lengths
+
+_state = None  # (index, taxon, coef) in pool workers
+
+
+def evaluate(index, sample, taxon, coef):
+    """Statistics of one sample (species names) in the report's result format."""
+    atd, taxonN, Taxon = distinctness.atd_mean(index, sample, taxon, coef)
+    return {
+        "n": len(sample),
+        "atd": atd,
+        "vtd": distinctness.atd_variance(taxonN, sample, atd, taxon, coef),
+        "euler": euler(sample, Taxon, atd, taxon, coef),
+        "N": taxonN,
+        "taxa": {t: len(Taxon[t]) for t in taxon},
+    }
+
+
+def sample_name(path):
+    """Result key of a sample file: its base name up to the first dot, as in PhyRe.py."""
+    return os.path.basename(path).split(".")[0]
+
+
+def sample_names(sample_files):
+    """``sample_name`` of every file; ValueError if two files share a name."""
+    names = [sample_name(path) for path in sample_files]
+    clashes = sorted(name for name, n in Counter(names).items() if n > 1)
+    if clashes:
+        raise ValueError(f"sample files share the name(s) {', '.join(map(repr, clashes))}; "
+                         "rename them so no result is overwritten")
+    return names
+
+
+def _init_worker(index, taxon, coef):
+    global _state
+    _state = (index, taxon, coef)
+
+
+def _evaluate_file(path):
+    index, taxon, coef = _state
+    return evaluate(index, loader.load_sample(path), taxon, coef)
+
+
+def run_batch(index, sample_files, taxon, coef, workers=None):
+    """``{sample name: result}`` for every sample file, in input order.
+
+    Raises ValueError before any work if two files map to the same name.
+    """
+    names = sample_names(sample_files)
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(sample_files) < 2:
+        _init_worker(index, taxon, coef)
+        results = [_evaluate_file(path) for path in sample_files]
+    else:
+        with ProcessPoolExecutor(workers, mp_context=fork_context(), initializer=_init_worker,
+                                 initargs=(index, taxon, coef)) as pool:
+            results = list(pool.map(_evaluate_file, sample_files,
+                                    chunksize=max(1, len(sample_files) // (workers * 4))))
+    return dict(zip(names, results))
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m phyre.batch",
+                                     description="Evaluate many PhyRe samples against one population.")
+    parser.add_argument("popfile", help="population master list")
+    parser.add_argument("samples", nargs="*", help="sample files")
+    parser.add_argument("--list", help="file listing one sample file per line (PhyRe's -b y)")
+    parser.add_argument("-m", "--missing", action="store_true",
+                        help="'/' inherits the taxon of the level above (PhyRe's -m y)")
+    parser.add_argument("-l", "--user-lengths", action="store_true",
+                        help="use the population's Coefficients: line (PhyRe's -l y)")
+    parser.add_argument("-j", "--workers", type=int, default=None, help="worker processes")
+    parser.add_argument("--text", help="write the PhyRe text report here ('-' for stdout)")
+    parser.add_argument("--csv", help="write one CSV row per sample here")
+    parser.add_argument("--json", help="write a JSON list of per-sample records here")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    sample_files = list(args.samples)
+    if args.list:
+        with open(args.list) as f:
+            sample_files += [line.strip() for line in f if line.strip()]
+    if not sample_files:
+        sys.exit("phyre.batch: no sample files given")
+    try:
+        sample_names(sample_files)
+    except ValueError as e:
+        sys.exit(f"phyre.batch: {e}")
+
+    index = loader.load_population(args.popfile, missing=args.missing)
+    taxon = index.taxon
+    coef, popN, pathLengths = path_lengths(index, taxon)
+    if args.user_lengths:
+        if index.coef is None:
+            sys.exit(f"phyre.batch: {args.popfile} has no Coefficients: line")
+        coef, pathLengths = index.coef, index.path_lengths
+    results = run_batch(index, sample_files, taxon, coef, args.workers)
+
+    if args.csv:
+        with open(args.csv, "w", newline="") as f:
+            report.write_csv(results, taxon, f)
+    if args.json:
+        with open(args.json, "w") as f:
+            report.write_json(results, taxon, f)
+    if args.text or not (args.csv or args.json):
+        text = report.text_report(results, taxon, popN, pathLengths, sample_files, index.duplicates)
+        if args.text in (None, "-"):
+            sys.stdout.write(text)
+        else:
+            with open(args.text, "w") as f:
+                f.write(text)
+
+
+if __name__ == "__main__":
+    main()
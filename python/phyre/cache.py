@@ -0,0 +1,97 @@
+"""On-disk cache of funnel rows.
+
+Funnel limits depend only on the population, the coefficients and the
+``p``/``seed``/``method``/``batch_size`` settings, so for a fixed seed the
+row of every dimension can be stored once and reused. Entries are one small
+file per ``(settings, dimension)``: extending ``d2`` computes only the new
+dimensions. Reads refresh an entry's mtime and the directory is trimmed
+oldest-first to ``max_bytes``, giving least-recently-used eviction.
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+
+from .index import PopulationIndex
+
+MAX_BYTES = 64 << 20
+
+
+def fingerprint(index, taxon, coef):
+    """Content hash of an indexed population at levels ``taxon`` with ``coef``.
+
+    Covers the species order and every level's codes and names, since the
+    funnel draws subsamples by row number.
+    """
+    h = hashlib.sha256()
+    h.update(json.dumps([list(taxon), [float(coef[t]) for t in taxon]]).encode())
+    h.update("\n".join(index.species).encode())
+    for t in taxon:
+        level = index.levels[t]
+        h.update(b"\0" + "\n".join(index.vocab[level]).encode())
+        h.update(index.columns[level].tobytes())
+    return h.hexdigest()
+
+
+class FunnelCache:
+    """Funnel rows stored under ``directory``, at most ``max_bytes`` of them."""
+
+    def __init__(self, directory, max_bytes=MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+
+    def key(self, population, taxon, coef, p, seed, method, batch_size):
+        """Cache key of one funnel configuration (every dimension shares it)."""
+        index = population if isinstance(population, PopulationIndex) \
+            else PopulationIndex.from_population(population, taxon)
+        settings = json.dumps([p, seed, method, batch_size]).encode()
+        return hashlib.sha256(fingerprint(index, taxon, coef).encode() + settings).hexdigest()
+
+    def path(self, key, d):
+        return os.path.join(self.directory, f"{key}-{d}.json")
+
+    def get(self, key, d):
+        """The cached row of dimension ``d``, or None."""
+        path = self.path(key, d)
+        try:
+            with open(path) as f:
+                row = json.load(f)
+            os.utime(path)
+        except (OSError, ValueError):
+            return None
+        return tuple(row)
+
+    def put(self, key, d, row):
+        # write-then-rename so concurrent runs never read a partial entry
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        with os.fdopen(fd, "w") as f:
+            json.dump(list(row), f)
+        os.replace(tmp, self.path(key, d))
+
+    def entries(self):
+        """``(mtime, size, path)`` of every entry, oldest first."""
+        result = []
+        with os.scandir(self.directory) as it:
+            for entry in it:
+                if entry.name.endswith(".json"):
+                    try:
+                        st = entry.stat()
+                    except FileNotFoundError:
+                        continue
+                    result.append((st.st_mtime, st.st_size, entry.path))
+        return sorted(result)
+
+    def evict(self):
+        """Remove least recently used entries until the cache fits ``max_bytes``."""
+        entries = self.entries()
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
@@ -0,0 +1,63 @@
+"""Checkpoints for long funnel runs.
+
+A ``FunnelCheckpoint`` records the rows of the dimensions a run has
+finished, together with the seed and a description of the inputs, in a
+small JSON file rewritten atomically after every dimension. A restarted
+run with the same population and settings picks up the seed and the
+finished rows and only computes the dimensions that are left.
+"""
+
+import json
+import os
+import random
+import tempfile
+
+
+class FunnelCheckpoint:
+    """Finished funnel rows of a run described by ``settings``.
+
+    ``settings`` is any JSON-serialisable value identifying the run apart
+    from its seed (population fingerprint, ``p``, method...). A checkpoint
+    written for other settings, or for a seed other than an explicit
+    ``seed``, is ignored. Without an explicit seed the checkpoint's seed is
+    reused, or a fresh one drawn.
+    """
+
+    def __init__(self, path, settings, seed=None):
+        self.path = path
+        self.settings = settings
+        self.seed = seed
+        self.rows = {}
+        state = self._read()
+        if state is not None and state.get("settings") == settings \
+                and seed in (None, state.get("seed")):
+            self.seed = state["seed"]
+            self.rows = {row[0]: tuple(row) for row in state["rows"]}
+        if self.seed is None:
+            self.seed = random.SystemRandom().getrandbits(64)
+
+    def _read(self):
+        try:
+            with open(self.path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def record(self, row):
+        """Add a finished row and persist the checkpoint."""
+        self.rows[row[0]] = tuple(row)
+        state = {"settings": self.settings, "seed": self.seed,
+                 "rows": [list(self.rows[d]) for d in sorted(self.rows)]}
+        directory = os.path.dirname(os.path.abspath(self.path))
+        fd, tmp = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        with os.fdopen(fd, "w") as f:
+            json.dump(state, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.path)
+
+    def remove(self):
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
@@ -0,0 +1,113 @@
+"""PhyRe's command line, on top of the importable ``phyre`` functions.
+
+    python PhyRe.py samplefile popfile d1 d2 [-o out] [-p 1000] [-c y|n]
+                    [-b y|n] [-l y|n] [-m y|n]
+
+writes the sample report to ``<out>.out`` (``out`` defaults to the sample
+file name up to its first dot) and, unless ``-c n``, the funnel confidence
+limits for dimensions ``d1..d2`` to ``<out up to its first _>_funnel.out``.
+``-b y`` treats ``samplefile`` as a list of sample files, ``-l y`` takes the
+path lengths from the population's ``Coefficients:`` line and ``-m y``
+lets ``/`` inherit the taxon of the level above.
+
+Funnel rows are written and flushed as each dimension completes, and
+recorded in ``<funnel file>.ckpt``; rerunning an interrupted command skips
+the dimensions already done. The checkpoint is removed when the table is
+complete.
+"""
+
+import argparse
+import os
+import sys
+
+from . import batch, loader, report
+from .cache import FunnelCache, fingerprint
+from .checkpoint import FunnelCheckpoint
+from .funnels import METHODS, format_row, iter_funnel
+from .pathlength import path_lengths
+
+
+def yes_no(value):
+    if value not in ("y", "n"):
+        raise argparse.ArgumentTypeError("expected y or n")
+    return value == "y"
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(prog="PhyRe.py",
+                                     description="Average taxonomic distinctness and funnel plots.")
+    parser.add_argument("samplefile", help="sample file, or with -b y a list of sample files")
+    parser.add_argument("popfile", help="population master list")
+    parser.add_argument("d1", type=int, help="smallest funnel dimension")
+    parser.add_argument("d2", type=int, help="largest funnel dimension")
+    parser.add_argument("-o", dest="out", help="output name (default: sample file name)")
+    parser.add_argument("-p", type=int, default=1000, help="permutations per funnel dimension")
+    parser.add_argument("-c", type=yes_no, default=True, metavar="y|n",
+                        help="compute funnel confidence limits")
+    parser.add_argument("-b", type=yes_no, default=False, metavar="y|n",
+                        help="samplefile lists one sample file per line")
+    parser.add_argument("-l", type=yes_no, default=False, metavar="y|n",
+                        help="use the population's Coefficients: path lengths")
+    parser.add_argument("-m", type=yes_no, default=False, metavar="y|n",
+                        help="'/' inherits the taxon of the level above")
+    parser.add_argument("-j", "--workers", type=int, default=1, help="worker processes")
+    parser.add_argument("--seed", type=int, help="funnel random seed, for reproducible tables")
+    parser.add_argument("--method", choices=sorted(METHODS), default="scalar",
+                        help="funnel permutation engine")
+    parser.add_argument("--cache", help="funnel cache directory (used with --seed)")
+    return parser.parse_args(argv)
+
+
+def sample_files(samplefile, listed):
+    if not listed:
+        return [samplefile]
+    with open(samplefile) as f:
+        return [line.strip() for line in f if line.strip()]
+
+
+def write_funnel(path, index, taxon, coef, args):
+    """Write the funnel table to ``path`` a row at a time, resuming from its checkpoint."""
+    settings = {"population": fingerprint(index, taxon, coef), "p": args.p, "method": args.method}
+    checkpoint = FunnelCheckpoint(path + ".ckpt", settings, args.seed)
+    cache = FunnelCache(args.cache) if args.cache and args.seed is not None else None
+    rows = iter_funnel(index, taxon, coef, args.p, args.d1, args.d2, seed=checkpoint.seed,
+                       workers=args.workers, method=args.method, cache=cache,
+                       done=checkpoint.rows)
+    with open(path, "w") as f:
+        f.write(report.funnel_header(args.p))
+        for row in rows:
+            f.write(format_row(row) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+            if row[0] not in checkpoint.rows:
+                checkpoint.record(row)
+    checkpoint.remove()
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    out = args.out or args.samplefile.split(".")[0]
+    files = sample_files(args.samplefile, args.b)
+    try:
+        batch.sample_names(files)
+    except ValueError as e:
+        sys.exit(f"PhyRe.py: {e}")
+
+    index = loader.load_population(args.popfile, missing=args.m)
+    taxon = index.taxon
+    coef, popN, pathLengths = path_lengths(index, taxon)
+    if args.l:
+        if index.coef is None:
+            sys.exit(f"PhyRe.py: -l y needs a Coefficients: line in {args.popfile}")
+        coef, pathLengths = index.coef, index.path_lengths
+
+    results = batch.run_batch(index, files, taxon, coef, args.workers)
+    with open(out + ".out", "w") as f:
+        f.write(report.text_report(results, taxon, popN, pathLengths, files, index.duplicates))
+
+    if args.c:
+        write_funnel(out.split("_")[0] + "_funnel.out", index, taxon, coef, args)
+
+
+if __name__ == "__main__":
+    main()
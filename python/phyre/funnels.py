@@ -0,0 +1,221 @@
+"""Funnel-plot confidence limits for AvTD and VarTD (PhyRe's ``Funnel``).
+
+For every sample size ``d`` in ``d1..d2``, ``p`` random subsamples of the
+population are drawn and their AvTD/VarTD collected; the funnel row holds
+the 5%/95% limits, means and extremes of those values.
+
+The ``(dimension, permutation batch)`` pairs are independent work units,
+so they can be spread over a process pool. Each unit seeds its own random
+generator from ``(seed, dimension, batch)``: for a given seed the output is
+identical whatever the number of workers or the order units finish in.
+Workers are forked where possible (``index.fork_context``) and share the
+population's code columns copy-on-write.
+
+``method="batched"`` (numpy only) evaluates a whole unit at once: the
+subsamples are drawn as a ``count x d`` matrix of row indices, and every
+level's pair counts come from sorting the gathered code matrix, so the hot
+loop builds no per-sample Python objects. It draws from numpy's generator,
+so its tables differ from the ``"scalar"`` method's for the same seed.
+
+With a ``cache.FunnelCache`` and an explicit seed, rows already computed for
+the same population and settings are read back instead of recomputed.
+``iter_funnel`` yields the rows one dimension at a time as they complete,
+so long runs can write and checkpoint their progress.
+"""
+
+import random
+from concurrent.futures import ProcessPoolExecutor
+
+from . import distinctness
+from .distinctness import np
+from .index import PopulationIndex, fork_context
+
+HEADER = "dimension AvTD05%   AvTDmean  AvTD95%   AvTDup    VarTDlow   VarTD05%   VarTDmean  VarTD95%"
+ROW_FORMAT = "%i        %6.4f   %6.4f   %6.4f   %6.4f   %6.4f   %6.4f   %6.4f   %6.4f"
+BATCH_SIZE = 100
+KEY_LIMIT = 1000  # largest population sampled through random sort keys
+
+_state = None  # (columns, n_species, levels, coef) in pool workers
+
+
+def format_row(row):
+    """One line of PhyRe's ``_funnel.out`` table."""
+    return ROW_FORMAT % row
+
+
+def unit_rng(seed, d, batch):
+    """Random generator of one work unit; string seeds hash the same in every process."""
+    return random.Random(f"phyre-funnel:{seed}:{d}:{batch}")
+
+
+def permutations(state, seed, d, batch, count):
+    """AvTD and VarTD of ``count`` random subsamples of ``d`` species."""
+    columns, n_species, taxon, coef = state
+    rng = unit_rng(seed, d, batch)
+    atds, vtds = [], []
+    for _ in range(count):
+        rows = rng.sample(range(n_species), d)
+        taxonN = dict(zip(taxon, distinctness.sample_pairs(columns, rows)))
+        atd = distinctness.avtd(taxonN, d, taxon, coef)
+        atds.append(atd)
+        vtds.append(distinctness.vartd(taxonN, d, atd, taxon, coef))
+    return atds, vtds
+
+
+def draw_subsamples(rng, n, d, count):
+    """``count x d`` row indices; every row is a sample without replacement.
+
+    Small populations take the ``d`` smallest of ``n`` random keys per row
+    in one call; past ``KEY_LIMIT`` the O(n) keys cost more than one
+    ``choice`` call per row, which stays O(d).
+    """
+    if n <= KEY_LIMIT:
+        return np.argpartition(rng.random((count, n)), d - 1, axis=1)[:, :d]
+    return np.stack([rng.choice(n, d, replace=False) for _ in range(count)])
+
+
+def squared_counts(codes):
+    """``sum(count**2)`` over the taxa of every row of a code matrix.
+
+    Each row is sorted so equal codes form runs; an element at offset ``r``
+    in its run adds ``2r + 1``, and those add up to ``count**2`` per run.
+    """
+    runs = np.sort(codes, axis=1)
+    count, d = runs.shape
+    pos = np.broadcast_to(np.arange(d), (count, d))
+    starts = np.ones((count, d), dtype=bool)
+    starts[:, 1:] = runs[:, 1:] != runs[:, :-1]
+    offset = pos - np.maximum.accumulate(np.where(starts, pos, 0), axis=1)
+    return (2 * offset + 1).sum(axis=1)
+
+
+def batched_permutations(state, seed, d, batch, count):
+    """Vectorised ``permutations``: all ``count`` subsamples evaluated together."""
+    columns, n_species, taxon, coef = state
+    rng = np.random.default_rng([seed % 2 ** 64, d, batch])
+    rows = draw_subsamples(rng, n_species, d, count)
+    total = np.zeros(count)
+    total_sq = np.zeros(count)
+    above = 0
+    for t, col in zip(taxon, columns):
+        taxonN = d * d - squared_counts(col[rows])
+        total = total + (taxonN - above) * coef[t]
+        total_sq = total_sq + (taxonN - above) * coef[t] ** 2
+        above = taxonN
+    pairs = d * (d - 1)
+    atds = total / pairs
+    vtds = (total_sq - ((atds * pairs) ** 2) / pairs) / pairs
+    return atds.tolist(), vtds.tolist()
+
+
+METHODS = {"scalar": permutations, "batched": batched_permutations}
+
+
+def _init_worker(state):
+    global _state
+    _state = state
+
+
+def _run_unit(method, seed, d, batch, count):
+    return METHODS[method](_state, seed, d, batch, count)
+
+
+def limits(d, atds, vtds):
+    """Funnel row for dimension ``d``, computed the way PhyRe's ``Funnel`` does."""
+    p = len(atds)
+    atds, vtds = sorted(atds), sorted(vtds)
+    AvTD = atds[int(.05 * p)], sum(atds) / p, atds[int(.95 * p)], max(atds)
+    VarTD = min(vtds), vtds[int(.05 * p)], sum(vtds) / p, vtds[int(.95 * p)]
+    return (d,) + AvTD + VarTD
+
+
+def work_units(p, d1, d2, batch_size=BATCH_SIZE):
+    """``(d, batch, count)`` for every batch of every dimension."""
+    return [(d, b, min(batch_size, p - start))
+            for d in range(d1, d2 + 1)
+            for b, start in enumerate(range(0, p, batch_size))]
+
+
+def iter_funnel(population, taxon, coef, p=1000, d1=10, d2=70, seed=None, workers=1,
+                batch_size=None, method="scalar", cache=None, done=None):
+    """Funnel rows in dimension order, each yielded as soon as it is complete.
+
+    Takes the arguments of ``funnel``. ``done`` maps dimensions finished by
+    an earlier run (e.g. read from a checkpoint) to their rows; those are
+    yielded again without being recomputed. Closing the generator early
+    cancels the work units not yet started.
+    """
+    if method not in METHODS:
+        raise ValueError(f"unknown funnel method {method!r}")
+    if method == "batched" and np is None:
+        raise ImportError("the batched funnel method needs numpy")
+    if batch_size is None:
+        batch_size = p if method == "batched" else BATCH_SIZE
+    if seed is None:
+        seed = random.SystemRandom().getrandbits(64)
+        cache = None
+    index = population if isinstance(population, PopulationIndex) \
+        else PopulationIndex.from_population(population, taxon)
+    rows = {d: row for d, row in (done or {}).items() if d1 <= d <= d2}
+    if cache is not None:
+        key = cache.key(index, taxon, coef, p, seed, method, batch_size)
+        for d in range(d1, d2 + 1):
+            row = None if d in rows else cache.get(key, d)
+            if row is not None:
+                rows[d] = row
+    units = [u for u in work_units(p, d1, d2, batch_size) if u[0] not in rows]
+    remaining = {}
+    for d, _, _ in units:
+        remaining[d] = remaining.get(d, 0) + 1
+
+    columns = distinctness.level_columns(index, taxon, numpy=method == "batched")
+    state = (columns, len(index), list(taxon), dict(coef))
+    pool = None
+    if units and workers > 1:
+        pool = ProcessPoolExecutor(workers, mp_context=fork_context(), initializer=_init_worker,
+                                   initargs=(state,))
+        # one dimension per chunk at most, so finished rows come back promptly
+        chunksize = max(1, min(len(units) // (workers * 4), len(units) // len(remaining)))
+        results = pool.map(_run_unit, *zip(*[(method, seed) + u for u in units]),
+                           chunksize=chunksize)
+    else:
+        results = (METHODS[method](state, seed, *u) for u in units)
+
+    try:
+        per_dim = {}
+        next_d = d1
+        for (d, _, _), (atds, vtds) in zip(units, results):
+            acc = per_dim.setdefault(d, ([], []))
+            acc[0].extend(atds)
+            acc[1].extend(vtds)
+            remaining[d] -= 1
+            if remaining[d] == 0:
+                rows[d] = limits(d, *per_dim.pop(d))
+                if cache is not None:
+                    cache.put(key, d, rows[d])
+            while next_d in rows:
+                yield rows[next_d]
+                next_d += 1
+        while next_d <= d2:
+            yield rows[next_d]
+            next_d += 1
+    finally:
+        if pool is not None:
+            pool.shutdown(cancel_futures=True)
+    if cache is not None:
+        cache.evict()
+
+
+def funnel(population, taxon, coef, p=1000, d1=10, d2=70, seed=None, workers=1,
+           batch_size=None, method="scalar", cache=None):
+    """Funnel rows ``(d, AvTD05, AvTDmean, AvTD95, AvTDup, VarTDlow, VarTD05, VarTDmean, VarTD95)``.
+
+    ``population`` is a ``population[species][level]`` dict or a ``PopulationIndex``.
+    ``workers > 1`` evaluates the work units in a process pool. Without a
+    ``seed`` one is drawn at random, so separate runs still differ. Units
+    hold ``batch_size`` permutations: ``BATCH_SIZE`` for the scalar method
+    and a whole dimension (``p``) for the batched one. ``cache`` is only
+    consulted when ``seed`` is given, as unseeded runs are meant to differ.
+    """
+    return list(iter_funnel(population, taxon, coef, p, d1, d2, seed, workers,
+                            batch_size, method, cache))
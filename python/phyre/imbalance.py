@@ -0,0 +1,66 @@
+"""von Euler's index of imbalance (PhyRe's ``euler``)."""
+
+
+def min_pairs(n, k):
+    # Pairs differing at a level with k taxa when one taxon takes n - k + 1
+    # species and each of the other k - 1 taxa a single one.
+    return (k - 1) * (n - k + 1) * 2 + (k - 1) * (k - 2)
+
+
+def max_group_sizes(n, counts, taxon):
+    """Per-level taxon sizes of PhyRe's maximally even TDmax arrangement.
+
+    PhyRe.py deals the species round-robin into the taxa of the lowest level
+    and then, level by level upwards, deals the groups below round-robin
+    into the taxa above, reversing each level's group order. Only the group
+    sizes matter for TDmax, so they are dealt here instead of species lists.
+    """
+    sizes = {}
+    below = None
+    for t in reversed(taxon):
+        k = counts[t]
+        if below is None:
+            level = [n // k + (g < n % k) for g in range(k)]
+        else:
+            level = [sum(below[g::k]) for g in range(k)]
+        level.reverse()
+        sizes[t] = below = level
+    return sizes
+
+
+def euler_from_counts(n, counts, atd, taxon, coef):
+    """``euler`` from the sample size and the number of taxa at each level."""
+    scale = n * (n - 1)
+    TDmin = 0
+    above = 0
+    for t in taxon:
+        pairs = min_pairs(n, counts[t])
+        TDmin += coef[t] * (pairs - above)
+        above = pairs
+    TDmin /= scale
+
+    sizes = max_group_sizes(n, counts, taxon)
+    TDmax = 0
+    above = 0
+    for t in taxon:
+        pairs = n * n - sum(size * size for size in sizes[t])
+        TDmax += coef[t] * (pairs - above)
+        above = pairs
+    TDmax /= scale
+
+    EI = (TDmax - atd) / (TDmax - TDmin) if TDmax != TDmin else float("nan")
+    return {"EI": EI, "TDmin": TDmin, "TDmax": TDmax}
+
+
+def euler(sample, Taxon, atd, taxon, coef):
+    """TDmin, TDmax and the imbalance index of a sample with AvTD ``atd``.
+
+    ``Taxon`` holds the sample's per-level taxon counts as returned by
+    ``atd_mean``; only the number of taxa at each level is used. TDmin
+    spreads the taxa as unevenly as possible (one big taxon, the others with
+    one species each) and TDmax as evenly as PhyRe.py's round-robin
+    arrangement does. Nothing passed in is modified, so concurrent calls are
+    safe. EI is NaN when TDmax == TDmin.
+    """
+    counts = {t: len(Taxon[t]) for t in taxon}
+    return euler_from_counts(len(sample), counts, atd, taxon, coef)
@@ -0,0 +1,93 @@
+"""Incremental AvTD/VarTD for a sample edited a few species at a time.
+
+``IncrementalDistinctness`` keeps, for every taxonomic level, the species
+count of each taxon in the sample and the running ``sum(count**2)``. Adding
+or removing a species touches one count per level, so each update costs
+O(levels), and ``taxonN`` (``n**2 - sum(count**2)`` per level), AvTD and
+VarTD can be read at any moment without rescanning the sample.
+"""
+
+from . import distinctness
+
+
+class IncrementalDistinctness:
+    """Distinctness of a sample drawn from a ``PopulationIndex``."""
+
+    def __init__(self, index, taxon, coef, sample=()):
+        self.index = index
+        self.taxon = list(taxon)
+        self.coef = dict(coef)
+        self._columns = [index.columns[index.levels[t]] for t in self.taxon]
+        self._counts = [{} for _ in self.taxon]
+        self._squares = [0] * len(self.taxon)
+        self.rows = set()
+        for species in sample:
+            self.add_species(species)
+
+    def _row(self, species):
+        return species if isinstance(species, int) else self.index.rows[species]
+
+    def add_species(self, species):
+        """Add one species (name or index row) to the sample."""
+        row = self._row(species)
+        if row in self.rows:
+            raise ValueError(f"{species!r} is already in the sample")
+        self.rows.add(row)
+        for l, col in enumerate(self._columns):
+            counts, code = self._counts[l], col[row]
+            k = counts.get(code, 0)
+            counts[code] = k + 1
+            self._squares[l] += 2 * k + 1  # (k + 1)**2 - k**2
+
+    def remove_species(self, species):
+        """Remove one species (name or index row) from the sample."""
+        row = self._row(species)
+        if row not in self.rows:
+            raise ValueError(f"{species!r} is not in the sample")
+        self.rows.remove(row)
+        for l, col in enumerate(self._columns):
+            counts, code = self._counts[l], col[row]
+            k = counts[code]
+            if k == 1:
+                del counts[code]
+            else:
+                counts[code] = k - 1
+            self._squares[l] -= 2 * k - 1  # k**2 - (k - 1)**2
+
+    def copy(self):
+        """An independent copy, e.g. to explore a neighbouring sample."""
+        other = object.__new__(type(self))
+        other.__dict__.update(self.__dict__)
+        other._counts = [dict(c) for c in self._counts]
+        other._squares = list(self._squares)
+        other.rows = set(self.rows)
+        return other
+
+    def __len__(self):
+        return len(self.rows)
+
+    @property
+    def taxonN(self):
+        """Ordered species pairs that differ at each level."""
+        n = len(self.rows)
+        return {t: n * n - sq for t, sq in zip(self.taxon, self._squares)}
+
+    @property
+    def Taxon(self):
+        """Species count of every taxon present, per level (PhyRe's ``Taxon``)."""
+        result = {}
+        for l, t in enumerate(self.taxon):
+            vocab = self.index.vocab[self.index.levels[t]]
+            result[t] = {vocab[code]: k for code, k in self._counts[l].items()}
+        return result
+
+    @property
+    def avtd(self):
+        return distinctness.avtd(self.taxonN, len(self.rows), self.taxon, self.coef)
+
+    @property
+    def vartd(self):
+        n = len(self.rows)
+        taxonN = self.taxonN
+        atd = distinctness.avtd(taxonN, n, self.taxon, self.coef)
+        return distinctness.vartd(taxonN, n, atd, self.taxon, self.coef)
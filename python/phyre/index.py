@@ -0,0 +1,106 @@
+"""Precomputed population index: the master list encoded once at load time.
+
+PhyRe.py keeps the population as ``population[species][level] -> name``
+dicts and rebuilds ``[data[i][t] for i in sample]`` lists on every
+statistic. ``PopulationIndex`` stores the same information as a
+species-by-level integer matrix, kept column-wise in ``array('i')`` (one
+4-byte cell per species and level), plus one name vocabulary per level.
+"""
+
+import multiprocessing
+from array import array
+
+
+def fork_context():
+    """Start method for process pools that share an index copy-on-write.
+
+    ``fork`` wherever the platform has it: Python 3.14 makes ``forkserver``
+    the Linux default, which would pickle the whole index into every
+    worker. Elsewhere None (the default method), where that copy is paid.
+    """
+    if "fork" in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context("fork")
+    return None
+
+
+class PopulationIndex:
+    """Species-by-level taxon codes with per-level vocabularies.
+
+    Row ``i`` is species ``species[i]``; ``columns[l][i]`` is the code of its
+    taxon at level ``taxon[l]`` and ``vocab[l][code]`` is that taxon's name.
+    """
+
+    def __init__(self, taxon):
+        self.taxon = list(taxon)
+        self.levels = {t: l for l, t in enumerate(self.taxon)}
+        self.species = []
+        self.rows = {}
+        self.vocab = [[] for _ in self.taxon]
+        self.columns = [array("i") for _ in self.taxon]
+        self._codes = [{} for _ in self.taxon]
+        # set by loader.load_population
+        self.coef = None
+        self.path_lengths = None
+        self.duplicates = []
+
+    @classmethod
+    def from_population(cls, population, taxon):
+        """Index a ``population[species][level]`` dict as built by PhyRe.py."""
+        index = cls(taxon)
+        for species, names in population.items():
+            index.add(species, [names[t] for t in index.taxon])
+        return index
+
+    def __len__(self):
+        return len(self.species)
+
+    def __contains__(self, species):
+        return species in self.rows
+
+    def code(self, level, name):
+        """Code of taxon ``name`` at level number ``level``, allocating new codes."""
+        codes = self._codes[level]
+        code = codes.get(name)
+        if code is None:
+            code = codes[name] = len(codes)
+            self.vocab[level].append(name)
+        return code
+
+    def add(self, species, names):
+        """Add a species with one taxon name per level.
+
+        A species already in the index has its row overwritten, so the last
+        occurrence wins as in PhyRe.py. Returns False for such duplicates.
+        """
+        # code() inlined: this runs once per row of multi-million-row lists
+        encoded = []
+        for codes, vocab, name in zip(self._codes, self.vocab, names):
+            code = codes.get(name)
+            if code is None:
+                code = codes[name] = len(vocab)
+                vocab.append(name)
+            encoded.append(code)
+        row = self.rows.get(species)
+        if row is None:
+            self.rows[species] = len(self.species)
+            self.species.append(species)
+            for col, code in zip(self.columns, encoded):
+                col.append(code)
+            return True
+        for col, code in zip(self.columns, encoded):
+            col[row] = code
+        return False
+
+    def rows_for(self, sample):
+        """Row numbers for a sample given as species names (or row numbers)."""
+        rows = self.rows
+        return [s if isinstance(s, int) else rows[s] for s in sample]
+
+    def names(self, species):
+        """``{level: taxon name}`` of one species, i.e. PhyRe's ``population[species]``."""
+        row = self.rows[species]
+        return {t: self.vocab[l][self.columns[l][row]] for l, t in enumerate(self.taxon)}
+
+    def to_population(self):
+        """The nested ``population[species][level]`` dict PhyRe.py works with."""
+        return {s: self.names(s) for s in self.species}
@@ -0,0 +1,94 @@
+"""Streaming parser for PhyRe population master lists and sample files.
+
+A population file looks like::
+
+    Taxon: Phylum Class Order Family Genus
+    Coefficients: 20 20 20 20 20        (optional, user-defined path lengths)
+    species1 Chordata Mammalia Primates Hominidae Homo
+    species2 Chordata Mammalia / Felidae Felis
+
+The headers are parsed once and every species row is encoded straight into
+the columns of a ``PopulationIndex`` in a single linear pass; no nested
+dicts or per-token ``list.index`` lookups are involved. With
+``missing=True`` (PhyRe's ``-m y``) a ``/`` inherits the taxon name of the
+level above it in the same row.
+"""
+
+from .index import PopulationIndex
+
+TAXON_HEADER = "Taxon:"
+COEF_HEADER = "Coefficients:"
+MISSING = "/"
+
+
+def _lines(source):
+    if hasattr(source, "read"):
+        yield from source
+    else:
+        with open(source) as f:
+            yield from f
+
+
+def parse_coefficients(values, taxon):
+    """``(coef, pathLengths)`` from the per-level path lengths of a Coefficients line."""
+    lengths = [float(v) for v in values]
+    if len(lengths) < len(taxon):
+        raise ValueError(f"{COEF_HEADER} needs {len(taxon)} values, got {len(lengths)}")
+    coef = {t: sum(lengths[l:]) for l, t in enumerate(taxon)}
+    path_lengths = {t: lengths[l] for l, t in enumerate(taxon)}
+    return coef, path_lengths
+
+
+def load_population(source, missing=False):
+    """Parse a population master list into a ``PopulationIndex``.
+
+    ``source`` is a path or an open text file. The index also carries
+    ``coef``/``path_lengths`` from a ``Coefficients:`` line (None without
+    one) and ``duplicates``, the species listed more than once in file
+    order; for those the last row wins, as in PhyRe.py.
+    """
+    index = None
+    coef = path_lengths = None
+    duplicates = []
+    for lineno, line in enumerate(_lines(source), 1):
+        if line.startswith(TAXON_HEADER):
+            index = PopulationIndex(line.split()[1:])
+            continue
+        if line.startswith(COEF_HEADER):
+            if index is None:
+                raise ValueError(f"line {lineno}: {COEF_HEADER} before {TAXON_HEADER}")
+            coef, path_lengths = parse_coefficients(line.split()[1:], index.taxon)
+            continue
+        x = line.split()
+        if not x:
+            continue
+        if index is None:
+            raise ValueError(f"line {lineno}: species row before {TAXON_HEADER}")
+        names = x[1:len(index.taxon) + 1]
+        if len(names) < len(index.taxon):
+            raise ValueError(f"line {lineno}: expected {len(index.taxon)} taxa for {x[0]}")
+        if missing:
+            above = ""
+            for l, name in enumerate(names):
+                if name == MISSING:
+                    names[l] = above
+                else:
+                    above = name
+        if not index.add(x[0], names):
+            duplicates.append(x[0])
+    if index is None:
+        raise ValueError(f"no {TAXON_HEADER} line in population file")
+    index.coef, index.path_lengths, index.duplicates = coef, path_lengths, duplicates
+    return index
+
+
+def load_sample(source):
+    """Species names of a sample file, first occurrence first, headers skipped."""
+    sample = {}
+    for line in _lines(source):
+        if line.startswith((TAXON_HEADER, COEF_HEADER)):
+            continue
+        x = line.split()
+        if x:
+            sample.setdefault(x[0], None)
+    return list(sample)
@@ -0,0 +1,71 @@
+"""Taxonomic path lengths derived from a population (PhyRe's ``PathLength``).
+
+PhyRe.py counts each taxon with ``list.count`` and checks names against the
+level above with ``in`` on a list, which is quadratic in the number of
+species. Here every level is counted once into a ``Counter`` and the
+comparison with the level above is a hash lookup, so the whole computation
+is linear in the size of the population.
+"""
+
+from collections import Counter
+
+from .index import PopulationIndex
+
+
+def level_taxa(data, taxon):
+    """``{level: Counter(taxon name -> number of species)}`` for a population.
+
+    ``data`` is a ``PopulationIndex`` or a ``population[species][level]``
+    dict. Only taxa that some species belongs to are counted: names left in
+    an index's vocabulary by an overwritten duplicate are not.
+    """
+    if isinstance(data, PopulationIndex):
+        taxa = {}
+        for t in taxon:
+            level = data.levels[t]
+            vocab = data.vocab[level]
+            taxa[t] = Counter({vocab[code]: n for code, n in Counter(data.columns[level]).items()})
+        return taxa
+    return {t: Counter(data[s][t] for s in data) for t in taxon}
+
+
+def level_sizes(taxa, taxon):
+    """Taxa per level, leaving out names already used at the level above.
+
+    With ``-m y`` a missing taxon inherits its parent's name, so such names
+    are not new taxa of the lower level.
+    """
+    taxonN = {}
+    above = {}
+    for t in taxon:
+        taxonN[t] = sum(1 for name in taxa[t] if name not in above)
+        above = taxa[t]
+    return taxonN
+
+
+def coefficients(taxonN, taxon):
+    """``(coef, pathLengths)`` scaled so the top-level distance is 100."""
+    n = [1.0] + [float(taxonN[t]) for t in taxon]
+    raw = [1 if n[i] > n[i + 1] else 1 - n[i] / n[i + 1] for i in range(len(taxon))]
+    s = sum(raw)
+    adjco = [c * 100 / s for c in raw]
+    coef, pathLengths = {}, {}
+    for i, t in enumerate(taxon):
+        coef[t] = sum(adjco[i:])
+        pathLengths[t] = adjco[i]
+    return coef, pathLengths
+
+
+def path_lengths(data, taxon, taxa=None):
+    """Path lengths from the taxon counts of a population; same results as PhyRe.py.
+
+    Returns ``(coef, taxonN, pathLengths)``: the distance between two
+    species that first differ at each level, the number of taxa per level
+    and the per-level step lengths. ``taxa`` may pass in ``level_taxa`` of
+    the population when the caller already has it.
+    """
+    if taxa is None:
+        taxa = level_taxa(data, taxon)
+    taxonN = level_sizes(taxa, taxon)
+    coef, pathLengths = coefficients(taxonN, taxon)
+    return coef, taxonN, pathLengths
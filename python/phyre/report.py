@@ -0,0 +1,98 @@
+"""PhyRe result reports: the original ``.out`` text layout, CSV and JSON.
+
+A result is the dict ``batch.evaluate`` returns for one sample: ``n``,
+``atd``, ``vtd``, ``euler`` (``EI``/``TDmin``/``TDmax``), ``N`` (ordered
+pairs differing at each level) and ``taxa`` (taxa per level).
+"""
+
+import csv
+import json
+
+from .funnels import HEADER
+
+RULE = "---------------------------------------------------"
+
+
+def duplicates_text(duplicates):
+    """Warning PhyRe.py prints when the master list repeats species."""
+    if not duplicates:
+        return ""
+    return "Population master list contains duplicates:\n" + "".join(f"{s} \n\n" for s in duplicates)
+
+
+def sample_text(name, result, taxon):
+    lines = [
+        RULE,
+        f"Results for sample:  {name} \n",
+        f"Dimension for this sample is {result['n']} \n",
+        "Number of taxa and pairwise comparisons  at each taxon level:",
+    ]
+    above = 0
+    for t in taxon:
+        lines.append("%-10s\t%i\t%i" % (t, result["taxa"][t], result["N"][t] - above))
+        above = result["N"][t]
+    lines += [
+        "\nNumber of pairwise comparisons is for pairs that differ "
+        "at each level excluding comparisons that differ at upper levels",
+        "",
+        "Average taxonomic distinctness      = %.4f" % result["atd"],
+        "Variation in taxonomic distinctness = %.4f" % result["vtd"],
+        "Minimum taxonomic distinctness      = %.4f" % result["euler"]["TDmin"],
+        "Maximum taxonomic distinctness      = %.4f" % result["euler"]["TDmax"],
+        "von Euler's index of imbalance      = %.4f" % result["euler"]["EI"],
+        "",
+    ]
+    return "\n".join(lines) + "\n"
+
+
+def text_report(results, taxon, popN, pathLengths, sample_files=(), duplicates=()):
+    """The ``<out>.out`` report of PhyRe.py for ``{sample name: result}``."""
+    parts = [duplicates_text(duplicates), "Output from Average Taxonomic Distinctness\n\n"]
+    parts += [f"{f}\n" for f in sample_files]
+    parts.append("Number of taxa and path lengths for each taxonomic level:\n")
+    parts += ["%-10s\t%d\t%.4f\n" % (t, popN[t], pathLengths[t]) for t in taxon]
+    parts.append("\n")
+    parts += [sample_text(name, result, taxon) for name, result in results.items()]
+    parts.append(RULE + "\n")
+    return "".join(parts)
+
+
+def funnel_header(p):
+    """Preamble and column header of PhyRe.py's ``_funnel.out`` table."""
+    return ("Confidence limits for average taxonomic distinctness and variation in taxonomic distinctness\n"
+            "limits are lower 95% limit for AvTD and upper 95% limit for VarTD\n\n"
+            f"Number of permutations for confidence limits = {p} \n\n"
+            f"{HEADER}\n")
+
+
+def rows(results, taxon):
+    """Flat records, one per sample, for CSV/JSON output."""
+    for name, result in results.items():
+        row = {
+            "sample": name,
+            "n": result["n"],
+            "avtd": result["atd"],
+            "vartd": result["vtd"],
+            "tdmin": result["euler"]["TDmin"],
+            "tdmax": result["euler"]["TDmax"],
+            "euler_index": result["euler"]["EI"],
+        }
+        above = 0
+        for t in taxon:
+            row[f"taxa_{t}"] = result["taxa"][t]
+            row[f"pairs_{t}"] = result["N"][t] - above
+            above = result["N"][t]
+        yield row
+
+
+def write_csv(results, taxon, f):
+    fields = ["sample", "n", "avtd", "vartd", "tdmin", "tdmax", "euler_index"]
+    fields += [f"{kind}_{t}" for t in taxon for kind in ("taxa", "pairs")]
+    writer = csv.DictWriter(f, fieldnames=fields)
+    writer.writeheader()
+    writer.writerows(rows(results, taxon))
+
+
+def write_json(results, taxon, f):
+    json.dump(list(rows(results, taxon)), f, indent=1)
+    f.write("\n")
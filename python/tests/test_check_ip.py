@@ -0,0 +1,81 @@
+import ipaddress
+import pathlib
+import random
+import sys
+
+import pytest
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parent.parent))
+
+import check_ip  # noqa: E402
+from check_ip import NetworkTable, ip_to_int  # noqa: E402
+
+
+def random_masks(rng, count):
+    masks = []
+    for _ in range(count):
+        length = rng.choice([8, 12, 16, 20, 24, 28, 30, 32])
+        # crowd most networks into a few /8s so that many of them nest
+        top = rng.choice([10, 172, 192, rng.randrange(256)])
+        masks.append(f"{ipaddress.IPv4Address(top << 24 | rng.getrandbits(24))}/{length}")
+    return masks
+
+
+def brute_force(ip, masks):
+    address = ipaddress.IPv4Address(ip)
+    matches = [ipaddress.ip_network(m, strict=False) for m in masks]
+    matches = [n for n in matches if address in n]
+    return str(max(matches, key=lambda n: n.prefixlen)) if matches else None
+
+
+def test_table_matches_brute_force_longest_prefix():
+    rng = random.Random(3)
+    masks = random_masks(rng, 300) + ["0.0.0.0/1", "10.0.0.0/8", "10.0.0.0/8", "255.255.255.255"]
+    table = NetworkTable(masks)
+    networks = [ipaddress.ip_network(m, strict=False) for m in masks]
+    probes = [str(n.network_address + offset) for n in networks
+              for offset in (0, n.num_addresses - 1) if n.num_addresses > offset]
+    probes += [str(n.network_address - 1) for n in networks if int(n.network_address) > 0]
+    probes += [str(n.broadcast_address + 1) for n in networks if int(n.broadcast_address) < 2 ** 32 - 1]
+    probes += [str(ipaddress.IPv4Address(rng.getrandbits(32))) for _ in range(500)]
+    for ip in probes:
+        expected = brute_force(ip, masks)
+        assert table.lookup(ip) == expected, ip
+        assert (ip in table) == (expected is not None)
+
+
+def test_check_ip_returns_matching_addresses():
+    masks = ["10.0.0.0/8", "192.168.1.7", "172.16.5.9/12"]
+    ips = ["10.1.2.3", "11.0.0.0", "192.168.1.7", "192.168.1.8", "172.31.255.255", "172.32.0.0"]
+    assert check_ip.check_ip(ips, masks) == ["10.1.2.3", "192.168.1.7", "172.31.255.255"]
+    assert NetworkTable(["10.0.0.0/255.255.0.0"]).lookup("10.0.9.9") == "10.0.0.0/16"
+    with pytest.raises(ValueError):
+        ip_to_int("10.0.0.256")
+
+
+def test_bulk_queries_match_single_lookups(monkeypatch):
+    np = pytest.importorskip("numpy")
+    from check_ip import parse_addresses
+
+    rng = random.Random(4)
+    masks = random_masks(rng, 200)
+    table = NetworkTable(masks)
+    ips = [str(ipaddress.IPv4Address(rng.getrandbits(32))) for _ in range(2000)]
+    ips += [n.split("/")[0] for n in table.networks]
+    values = parse_addresses(ips)
+    assert values.dtype == np.uint32
+    assert values.tolist() == [ip_to_int(ip) for ip in ips]
+    assert parse_addresses(("\n".join(ips) + "\n").encode()).tolist() == values.tolist()
+
+    labels = table.label_many(ips)
+    assert labels.tolist() == [table.label(ip) for ip in ips]
+    monkeypatch.setattr(check_ip, "DIRECTORY_MIN", 1)
+    assert NetworkTable(masks).label_many(values).tolist() == labels.tolist()
+    assert table.contains_many(values).tolist() == [ip in table for ip in ips]
+    assert NetworkTable([]).contains_many(ips[:3]).tolist() == [False] * 3
+
+    # off the fast path: whitespace is tolerated, bad addresses are not
+    assert parse_addresses([" 10.0.0.1", "10.0.0.2\r"]).tolist() == [167772161, 167772162]
+    for bad in (["10.0.0.256"], ["10.0.0"], ["010.0.0.1"], ["10.0.0.1", ""]):
+        with pytest.raises(ValueError):
+            parse_addresses(bad)
@@ -0,0 +1,271 @@
+import bz2
+import gzip
+import importlib.util
+import io
+import lzma
+import json
+import os
+import pathlib
+import subprocess
+import sys
+
+import pytest
+
+
+# --- dynamic import of the repo-root job scripts ---
+REPO_ROOT = pathlib.Path(__file__).resolve().parent.parent.parent
+MAPPER_PATH = REPO_ROOT / "mapper.py"
+REDUCER_PATH = REPO_ROOT / "reducer.py"
+sys.path.insert(0, str(REPO_ROOT))
+
+
+def load(name):
+    path = REPO_ROOT / f"{name}.py"
+    assert path.exists(), f"Could not find file: {path}"
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+mapper = load("mapper")
+shuffle = load("shuffle")
+merge_parts = load("merge_parts")
+local_mapreduce = load("local_mapreduce")
+
+
+def run_script(path, data, args=(), input_file=None):
+    env = dict(os.environ)
+    if input_file is not None:
+        env["mapreduce_map_input_file"] = input_file
+    proc = subprocess.run(
+        [sys.executable, str(path), *args],
+        input=data, capture_output=True, env=env, check=True,
+    )
+    return proc.stdout
+
+
+def line_counts(data, mapper_args=(), input_file="gs://bucket/data/a.py", reducer_args=()):
+    mapped = run_script(MAPPER_PATH, data, mapper_args, input_file)
+    shuffled = b"".join(sorted(mapped.splitlines(keepends=True)))
+    return run_script(REDUCER_PATH, shuffled, reducer_args)
+
+
+def test_input_key_prefers_modern_env_name():
+    env = {"mapreduce_map_input_file": "gs://b/x/new.py", "map_input_file": "old.py"}
+    assert mapper.input_key(env) == '"new.py"'
+    assert mapper.input_key({"map_input_file": "/tmp/old.py"}) == '"old.py"'
+    assert mapper.input_key({}) == '"UNKNOWN"'
+
+
+def test_combiner_flushes_on_key_threshold():
+    out = io.StringIO()
+    combiner = mapper.Combiner(out, max_keys=2)
+    for key in ('"a"', '"b"', '"a"', '"c"', '"c"'):
+        combiner.add(key)
+    assert out.getvalue() == '"a"\t2\n"b"\t1\n'
+    combiner.flush()
+    assert out.getvalue().endswith('"c"\t2\n')
+
+
+def test_combine_mode_matches_per_line_output():
+    data = b"first\nsecond\n\nlast line without newline"
+    plain = line_counts(data)
+    assert plain == b'"a.py": 4\n'
+    assert line_counts(data, ["--combine"]) == plain
+    assert run_script(MAPPER_PATH, data, ["--combine"], "a.py") == b'"a.py"\t4\n'
+
+
+def test_combine_mode_skips_empty_input():
+    assert run_script(MAPPER_PATH, b"", ["--combine"], "a.py") == b""
+
+
+def test_count_lines_matches_text_mode_iteration():
+    samples = [
+        b"", b"\n", b"a", b"a\n", b"a\nb", b"a\r\nb\r\n", b"a\rb\rc",
+        b"\r\r\n\n", b"x" * 10 + b"\r\n" + b"y" * 7,
+    ]
+    for data in samples:
+        # sys.stdin on POSIX: newline="\n", a lone "\r" does not end a line
+        stdin = io.TextIOWrapper(io.BytesIO(data), encoding="latin-1", newline="\n")
+        expected = sum(1 for _ in stdin)
+        for block_size in (1, 2, 3, 1 << 20):
+            assert mapper.count_lines(io.BytesIO(data), block_size) == expected, (data, block_size)
+
+
+def test_binary_mode_matches_per_line_output():
+    data = b"one\r\ntwo\nthree"
+    assert line_counts(data, ["--binary", "--block-size", "2"]) == line_counts(data)
+    lone_cr = b"a\rb\rc\n"
+    assert line_counts(lone_cr) == b'"a.py": 1\n'
+    for args in (["--combine"], ["--binary"], ["--binary", "--block-size", "2"]):
+        assert line_counts(lone_cr, args) == b'"a.py": 1\n', args
+
+
+def write_corpus(root):
+    data = root / "data"
+    data.mkdir()
+    (data / "a.py").write_bytes(b"import os\n\nprint(os.sep)\n")
+    (data / "b.txt").write_bytes(b"one line, no newline")
+    (data / "empty.md").write_bytes(b"")
+    return data
+
+
+def test_local_runner_counts_lines_per_file(tmp_path):
+    data = write_corpus(tmp_path)
+    expected = b'"a.py": 3\n"b.txt": 1\n'
+    for extra in ("", "--combine", "--binary"):
+        out_path = tmp_path / f"out{extra}.txt"
+        local_mapreduce.main([str(data), "-o", str(out_path), "-j", "2", f"--mapper-args={extra}"])
+        assert out_path.read_bytes() == expected
+
+
+def test_external_sort_spills_and_merges_in_passes(tmp_path):
+    keys = [f'"f{i % 7}"'.encode() for i in range(200)]
+    lines = [k + b"\t" + str(i).encode() + b"\n" for i, k in enumerate(keys)]
+    out = io.BytesIO()
+    shuffle.external_sort([lines[:120], lines[120:]], out, tmp_path, run_bytes=200, fan_in=3)
+    result = out.getvalue().splitlines(keepends=True)
+    # grouped by key, and stable within a key like `sort -s -k1,1`
+    assert result == sorted(lines, key=shuffle.record_key)
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_hash_reducer_merges_unsorted_concatenated_input():
+    data = b'"b"\t2\n"a"\t1\n\nbad\tx\n"b"\t3\n"a"\t4\n'
+    assert run_script(REDUCER_PATH, data, ["--hash"]) == b'"b": 5\n"a": 5\n'
+    assert run_script(REDUCER_PATH, data, ["--hash", "--sort"]) == b'"a": 5\n"b": 5\n'
+
+
+def test_local_runner_without_shuffle_uses_hash_reducer(tmp_path):
+    data = write_corpus(tmp_path)
+    out_path = tmp_path / "out.txt"
+    local_mapreduce.main([str(data), "-o", str(out_path), "--no-shuffle",
+                          "--reducer-args=--hash --sort"])
+    assert out_path.read_bytes() == b'"a.py": 3\n"b.txt": 1\n'
+
+
+def test_stats_mode_reports_all_metrics_in_one_pass():
+    data = b"class A:\r\n    def f(self):\n        pass\n\n  \nasync def g(): ...\r"
+    tsv = line_counts(data, ["--stats"], "a.py", ["--stats", "--header"])
+    assert tsv == b"file\tlines\tbytes\tnonblank\tmax_line\tdefs\tclasses\n" \
+                  b"a.py\t6\t" + str(len(data)).encode() + b"\t4\t19\t2\t1\n"
+    assert line_counts(data, ["--stats"], "a.txt", ["--stats"]).endswith(b"\t0\t0\n")
+    # a lone "\r" is not a line break, as for the default line count
+    lone_cr = b"a\rb\rc\n"
+    assert line_counts(lone_cr, ["--stats"], "a.txt", ["--stats"]) == b"a.txt\t1\t6\t1\t5\t0\t0\n"
+    assert line_counts(lone_cr, input_file="a.txt") == b'"a.txt": 1\n'
+
+
+def test_stats_reducer_combines_fields_associatively():
+    data = b'"a.py"\t2\t10\t2\t7\t1\t0\n"a.py"\t3\t20\t1\t4\t0\t1\n"a.py"\tbad\n'
+    out = run_script(REDUCER_PATH, data, ["--stats", "--format", "json"])
+    assert json.loads(out) == {"file": "a.py", "lines": 5, "bytes": 30, "nonblank": 3,
+                               "max_line": 7, "defs": 1, "classes": 1}
+
+
+def test_combiner_emits_intermediate_records():
+    data = b'"a.py"\t1\n"a.py"\t1\n"b.py"\t1\n'
+    assert run_script(REDUCER_PATH, data, ["--combine"]) == b'"a.py"\t2\n"b.py"\t1\n'
+    stats = b'"a.py"\t1\t4\t1\t3\t0\t0\n"a.py"\t2\t9\t2\t5\t1\t0\n'
+    assert run_script(REDUCER_PATH, stats, ["--combine", "--stats"]) == b'"a.py"\t3\t13\t3\t5\t1\t0\n'
+
+
+def test_combiner_runs_through_distributed_cache_symlinks(tmp_path):
+    # Hadoop -files: every script sits in its own cache directory and is
+    # symlinked into the task's working directory.
+    work = tmp_path / "work"
+    work.mkdir()
+    for i, path in enumerate((MAPPER_PATH, REDUCER_PATH), 1):
+        cache = tmp_path / "filecache" / str(i)
+        cache.mkdir(parents=True)
+        (cache / path.name).write_bytes(path.read_bytes())
+        (work / path.name).symlink_to(cache / path.name)
+    proc = subprocess.run([sys.executable, "reducer.py", "--combine"], cwd=work,
+                          input=b'"a.py"\t1\n"a.py"\t2\n', capture_output=True, check=True)
+    assert proc.stdout == b'"a.py"\t3\n'
+
+
+def test_local_runner_with_combiner(tmp_path):
+    data = write_corpus(tmp_path)
+    out_path = tmp_path / "out.txt"
+    local_mapreduce.main([str(data), "-o", str(out_path),
+                          f"--combiner={sys.executable} {REDUCER_PATH} --combine"])
+    assert out_path.read_bytes() == b'"a.py": 3\n"b.txt": 1\n'
+
+
+def test_multiple_reducers_match_single_reducer(tmp_path):
+    data = tmp_path / "data"
+    data.mkdir()
+    for i in range(12):
+        (data / f"f{i:02d}.txt").write_bytes(b"x\n" * (i + 1))
+    single, multi = tmp_path / "single.txt", tmp_path / "multi.txt"
+    local_mapreduce.main([str(data), "-o", str(single)])
+    local_mapreduce.main([str(data), "-o", str(multi), "-r", "3"])
+    assert multi.read_bytes() == single.read_bytes()
+    assert single.read_bytes().startswith(b'"f00.txt": 1\n"f01.txt": 2\n')
+
+
+def test_multiple_reducers_reject_unsorted_part_files(tmp_path, capsys):
+    data = write_corpus(tmp_path)
+    for extra in (["--no-shuffle", "--reducer-args=--hash --sort"], ["--reducer-args=--hash"]):
+        with pytest.raises(SystemExit):
+            local_mapreduce.parse_args([str(data), "-r", "2"] + extra)
+        assert "--reducers" in capsys.readouterr().err
+    out_path = tmp_path / "out.txt"
+    local_mapreduce.main([str(data), "-o", str(out_path), "-r", "2", "--reducer-args=--hash --sort"])
+    assert out_path.read_bytes() == b'"a.py": 3\n"b.txt": 1\n'
+
+
+def test_merge_parts_keeps_reducer_key_order(tmp_path):
+    # the reducers sort on the quoted key, where '"a b"' < '"a"'
+    (tmp_path / "part-00000").write_bytes(b"a b\t1\t1\t1\t1\t0\t0\nc\t2\t2\t2\t1\t0\t0\n")
+    (tmp_path / "part-00001").write_bytes(merge_parts.TSV_HEADER + b"\na\t3\t3\t3\t1\t0\t0\n")
+    out = io.BytesIO()
+    merge_parts.merge([str(tmp_path)], out, "tsv")
+    names = [line.split(b"\t")[0] for line in out.getvalue().splitlines()]
+    assert names == [b"file", b"a b", b"a", b"c"]
+
+
+class Trickle(io.RawIOBase):
+    # A pipe whose writer is slow: every read returns a single byte.
+
+    def __init__(self, data):
+        self.data = data
+
+    def readable(self):
+        return True
+
+    def readinto(self, b):
+        chunk, self.data = self.data[:1], self.data[1:]
+        b[:len(chunk)] = chunk
+        return len(chunk)
+
+
+def test_decompress_detects_magic_split_across_reads():
+    text = b"one\ntwo\n"
+    for data, lines in ((gzip.compress(text), 2), (lzma.compress(text), 2), (text, 2), (b"x", 1)):
+        stream = mapper.open_input(io.BufferedReader(Trickle(data)))
+        assert mapper.count_lines(stream, 3) == lines, data
+
+
+def test_decompress_counts_lines_of_compressed_inputs(tmp_path):
+    data = tmp_path / "data"
+    data.mkdir()
+    text = b"def f():\n    return 1\n\nlast"
+    (data / "a.py.gz").write_bytes(gzip.compress(text))
+    (data / "b.py.bz2").write_bytes(bz2.compress(text))
+    (data / "c.py.xz").write_bytes(lzma.compress(text))
+    (data / "d.py").write_bytes(text)
+    expected = b"".join(b'"%s": 4\n' % name for name in (b"a.py.gz", b"b.py.bz2", b"c.py.xz", b"d.py"))
+    for extra in ("", "--binary"):
+        out_path = tmp_path / "out.txt"
+        local_mapreduce.main([str(data), "-o", str(out_path), "--decompress", f"--mapper-args={extra}"])
+        assert out_path.read_bytes() == expected
+    lone_cr = b"a\rb\rc\n"
+    for args in ([], ["--combine"], ["--binary"]):
+        counts = line_counts(gzip.compress(lone_cr), args + ["--decompress"], "a.py.gz")
+        assert counts == line_counts(lone_cr, args, "a.py.gz") == b'"a.py.gz": 1\n', args
+    stats = line_counts(gzip.compress(text), ["--stats", "--decompress"], "a.py.gz", ["--stats"])
+    assert stats == b"a.py.gz\t4\t%d\t3\t12\t1\t0\n" % len(text)
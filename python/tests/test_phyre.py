@@ -0,0 +1,410 @@
+import io
+import multiprocessing
+import os
+import pathlib
+import random
+import sys
+
+import pytest
+
+# --- the phyre package lives next to PhyRe.py in repo/python ---
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parent.parent))
+
+from phyre import batch, cache, cli, distinctness, funnels, loader, report  # noqa: E402
+from phyre.imbalance import euler  # noqa: E402
+from phyre.incremental import IncrementalDistinctness  # noqa: E402
+from phyre.index import PopulationIndex, fork_context  # noqa: E402
+from phyre.pathlength import path_lengths  # noqa: E402
+
+TAXON = ["Phylum", "Class", "Order", "Family", "Genus"]
+COEF = {"Phylum": 100.0, "Class": 80.0, "Order": 55.0, "Family": 30.0, "Genus": 12.5}
+
+
+def make_population(n_species=300, branching=(3, 4, 4, 5, 6), seed=1):
+    rng = random.Random(seed)
+    population = {}
+    for i in range(n_species):
+        path, names = [], {}
+        for t, k in zip(TAXON, branching):
+            path.append(str(rng.randrange(k)))
+            names[t] = f"{t}{'.'.join(path)}"
+        population[f"sp{i}"] = names
+    return population
+
+
+def write_population(path, population):
+    path.write_text("Taxon: " + " ".join(TAXON) + "\n" + "".join(
+        f"{s} {' '.join(names[t] for t in TAXON)}\n" for s, names in population.items()))
+
+
+# Straight Python 3 ports of PhyRe.py's ATDmean / ATDvariance, kept as the
+# reference the faster engines must agree with.
+def reference_atd_mean(data, sample):
+    N = len(sample)
+    Taxon = {}; taxonN = {}; AvTD = 0; n = 0
+    for t in TAXON:
+        Taxon[t] = {}
+        x = [data[i][t] for i in sample]
+        for i in set(x):
+            Taxon[t][i] = x.count(i)
+    for t in TAXON:
+        taxonN[t] = sum([Taxon[t][i] * Taxon[t][j] for i in Taxon[t] for j in Taxon[t] if i != j])
+        n = taxonN[t] - n
+        AvTD = AvTD + (n * COEF[t])
+        n = taxonN[t]
+    AvTD /= (N * (N - 1))
+    return AvTD, taxonN, Taxon
+
+
+def reference_atd_variance(taxonN, sample, atd):
+    vtd = 0; n = 0
+    for t in TAXON:
+        n = taxonN[t] - n
+        vtd = vtd + n * COEF[t] ** 2
+        n = taxonN[t]
+    N = len(sample)
+    n = N * (N - 1)
+    return (vtd - ((atd * n) ** 2) / n) / n
+
+
+def reference_path_length(population):
+    Taxon = {}; taxonN = {}; X = {}
+    for t in TAXON:
+        Taxon[t] = {}
+        X[t] = [population[i][t] for i in population]
+        if TAXON.index(t) == 0:
+            for i in set(X[t]):
+                Taxon[t][i] = X[t].count(i)
+        else:
+            for i in set(X[t]):
+                if i not in X[TAXON[TAXON.index(t)-1]]:
+                    Taxon[t][i] = X[t].count(i)
+        taxonN[t] = len(Taxon[t])
+    n = [float(len(Taxon[t])) for t in TAXON]
+    n.insert(0, 1.0)
+    raw = [1 if n[i] > n[i+1] else (1 - n[i]/n[i+1]) for i in range(len(n)-1)]
+    adjco = [i*100/sum(raw) for i in raw]
+    coef = {t: sum(adjco[i:]) for i, t in enumerate(TAXON)}
+    return coef, taxonN, {t: adjco[i] for i, t in enumerate(TAXON)}
+
+
+def reference_euler(sample, Taxon, atd):
+    # PhyRe.py's euler with its species lists, minus the in-place reversal
+    # of the global taxon list.
+    n = len(sample)
+    TDmin = 0; N = 0
+    for t in TAXON:
+        k = len(Taxon[t])
+        TDmin += COEF[t] * (((k-1)*(n-k+1)*2 + (k-1)*(k-2)) - N)
+        N += ((k-1)*(n-k+1)*2 + (k-1)*(k-2)) - N
+    TDmin /= (n * (n-1))
+    levels = TAXON[::-1]
+    TaxMax = {}
+    for t in levels:
+        TaxMax[t] = []
+        for i in range(len(Taxon[t])):
+            if levels.index(t) == 0:
+                TaxMax[t].append([sample[j] for j in range(i, n, len(Taxon[t]))])
+            else:
+                s = levels[levels.index(t) - 1]
+                TaxMax[t].append([])
+                for j in [TaxMax[s][j] for j in range(i, len(Taxon[s]), len(Taxon[t]))]:
+                    TaxMax[t][i] += j
+        TaxMax[t].reverse()
+    TDmax = 0; m = 0
+    for t in TAXON:
+        taxonN = sum([len(a) * len(b) for i, a in enumerate(TaxMax[t]) for j, b in enumerate(TaxMax[t]) if i != j])
+        TDmax += (taxonN - m) * COEF[t]
+        m = taxonN
+    TDmax /= (n * (n-1))
+    EI = (TDmax-atd)/(TDmax-TDmin) if TDmax != TDmin else float("nan")
+    return {"EI": EI, "TDmin": TDmin, "TDmax": TDmax}
+
+
+@pytest.fixture(params=["numpy", "pure-python"])
+def engine(request, monkeypatch):
+    if request.param == "numpy":
+        pytest.importorskip("numpy")
+    else:
+        monkeypatch.setattr(distinctness, "np", None)
+    return request.param
+
+
+@pytest.fixture
+def population():
+    return make_population()
+
+
+def test_atd_mean_and_variance_match_reference(engine, population):
+    rng = random.Random(7)
+    for size in (2, 10, 57, len(population)):
+        sample = rng.sample(list(population), size)
+        atd, taxonN, Taxon = distinctness.atd_mean(population, sample, TAXON, COEF)
+        ref_atd, ref_taxonN, ref_Taxon = reference_atd_mean(population, sample)
+        assert atd == pytest.approx(ref_atd)
+        assert taxonN == ref_taxonN
+        assert Taxon == ref_Taxon
+        vtd = distinctness.atd_variance(taxonN, sample, atd, TAXON, COEF)
+        assert vtd == pytest.approx(reference_atd_variance(ref_taxonN, sample, ref_atd))
+
+
+def test_population_index_round_trips_and_feeds_statistics(engine, population):
+    index = PopulationIndex.from_population(population, TAXON)
+    assert len(index) == len(population) and "sp3" in index
+    assert index.to_population() == population
+    assert max(len(col) for col in index.columns) == len(population)
+    sample = list(population)[::3]
+    assert distinctness.atd_mean(index, sample, TAXON, COEF) == \
+        distinctness.atd_mean(population, sample, TAXON, COEF)
+    assert funnels.funnel(index, TAXON, COEF, p=10, d1=4, d2=5, seed=1) == \
+        funnels.funnel(population, TAXON, COEF, p=10, d1=4, d2=5, seed=1)
+    assert index.add("sp3", ["P", "C", "O", "F", "G"]) is False
+    assert index.names("sp3") == dict(zip(TAXON, ["P", "C", "O", "F", "G"]))
+
+
+def test_funnel_is_reproducible_across_worker_counts(engine, population):
+    serial = funnels.funnel(population, TAXON, COEF, p=40, d1=5, d2=8, seed=3, batch_size=16)
+    parallel = funnels.funnel(population, TAXON, COEF, p=40, d1=5, d2=8, seed=3, workers=2,
+                             batch_size=16)
+    assert parallel == serial
+    assert [row[0] for row in serial] == [5, 6, 7, 8]
+    assert funnels.funnel(population, TAXON, COEF, p=40, d1=5, d2=8, seed=4, batch_size=16) != serial
+
+
+def test_funnel_of_whole_population_has_no_spread(engine):
+    population = make_population(n_species=12)
+    atd, taxonN, _ = reference_atd_mean(population, list(population))
+    vtd = reference_atd_variance(taxonN, list(population), atd)
+    (row,) = funnels.funnel(population, TAXON, COEF, p=5, d1=12, d2=12, seed=0)
+    assert row[0] == 12
+    assert row[1:5] == pytest.approx([atd] * 4)
+    assert row[5:] == pytest.approx([vtd] * 4)
+
+
+def test_batched_funnel_matches_scalar_evaluation(population):
+    np = pytest.importorskip("numpy")
+    columns = distinctness.level_columns(PopulationIndex.from_population(population, TAXON))
+    rows = np.array([rng.sample(range(len(population)), 9) for rng in [random.Random(5)] * 6])
+    sq = funnels.squared_counts(columns[2][rows])
+    for row, total in zip(rows, sq):
+        counts = distinctness.code_counts(columns[2][row])
+        assert total == sum(int(c) ** 2 for c in counts)
+
+    whole = make_population(n_species=12)
+    scalar = funnels.funnel(whole, TAXON, COEF, p=5, d1=12, d2=12, seed=0)
+    batched = funnels.funnel(whole, TAXON, COEF, p=5, d1=12, d2=12, seed=0, method="batched")
+    assert batched == pytest.approx(scalar)
+
+    rows_a = funnels.funnel(population, TAXON, COEF, p=50, d1=10, d2=12, seed=2, method="batched")
+    rows_b = funnels.funnel(population, TAXON, COEF, p=50, d1=10, d2=12, seed=2, method="batched",
+                           workers=2)
+    assert rows_a == rows_b
+    for row in rows_a:
+        assert row[1] <= row[2] <= row[3] <= row[4]
+        assert row[5] <= row[6] <= row[7]
+
+
+POPFILE = """Taxon: Phylum Class Genus
+Coefficients: 50 30 20
+sp1 P1 C1 G1
+sp2 P1 / G2
+
+sp3 P2 C3 /
+sp1 P1 C1 G9
+"""
+
+
+def test_load_population_streams_rows_into_index():
+    index = loader.load_population(io.StringIO(POPFILE), missing=True)
+    assert index.taxon == ["Phylum", "Class", "Genus"]
+    assert index.species == ["sp1", "sp2", "sp3"]
+    assert index.names("sp2") == {"Phylum": "P1", "Class": "P1", "Genus": "G2"}
+    assert index.names("sp3") == {"Phylum": "P2", "Class": "C3", "Genus": "C3"}
+    assert index.names("sp1")["Genus"] == "G9"
+    assert index.duplicates == ["sp1"]
+    assert index.coef == {"Phylum": 100.0, "Class": 50.0, "Genus": 20.0}
+    assert index.path_lengths == {"Phylum": 50.0, "Class": 30.0, "Genus": 20.0}
+
+    plain = loader.load_population(io.StringIO(POPFILE))
+    assert plain.names("sp2")["Class"] == "/"
+    with pytest.raises(ValueError):
+        loader.load_population(io.StringIO("sp1 P1 C1\n"))
+
+
+def test_load_sample_skips_headers_and_repeats():
+    text = "Taxon: Phylum Class\nsp2 x y\n\nsp1\nsp2\n"
+    assert loader.load_sample(io.StringIO(text)) == ["sp2", "sp1"]
+
+
+def test_incremental_updates_track_full_recomputation(population):
+    index = PopulationIndex.from_population(population, TAXON)
+    rng = random.Random(11)
+    names = list(population)
+    sample = rng.sample(names, 20)
+    inc = IncrementalDistinctness(index, TAXON, COEF, sample)
+    for step in range(60):
+        if step % 3 == 2 or len(sample) < 3:
+            species = rng.choice([s for s in names if s not in sample])
+            inc.add_species(species)
+            sample.append(species)
+        else:
+            species = sample.pop(rng.randrange(len(sample)))
+            inc.remove_species(species)
+        atd, taxonN, Taxon = reference_atd_mean(population, sample)
+        assert inc.taxonN == taxonN
+        assert inc.Taxon == Taxon
+        assert inc.avtd == pytest.approx(atd)
+        assert inc.vartd == pytest.approx(reference_atd_variance(taxonN, sample, atd))
+
+    branch = inc.copy()
+    branch.remove_species(sample[0])
+    assert len(branch) == len(inc) - 1 and inc.taxonN == taxonN
+    with pytest.raises(ValueError):
+        inc.add_species(sample[0])
+
+
+def test_batch_evaluates_sample_files_in_parallel(tmp_path, population):
+    index = PopulationIndex.from_population(population, TAXON)
+    rng = random.Random(5)
+    paths, samples = [], {}
+    for i in range(4):
+        sample = rng.sample(list(population), 15 + i)
+        path = tmp_path / f"sample{i}.txt"
+        path.write_text("\n".join(sample) + "\n")
+        paths.append(str(path))
+        samples[f"sample{i}"] = sample
+
+    serial = batch.run_batch(index, paths, TAXON, COEF, workers=1)
+    assert batch.run_batch(index, paths, TAXON, COEF, workers=2) == serial
+    if "fork" in multiprocessing.get_all_start_methods():
+        # whatever the interpreter's default, workers share the index copy-on-write
+        assert fork_context().get_start_method() == "fork"
+    assert list(serial) == list(samples)
+    for name, sample in samples.items():
+        atd, taxonN, Taxon = reference_atd_mean(population, sample)
+        assert serial[name]["atd"] == pytest.approx(atd)
+        assert serial[name]["vtd"] == pytest.approx(reference_atd_variance(taxonN, sample, atd))
+        assert serial[name]["N"] == taxonN
+
+    out = io.StringIO()
+    report.write_csv(serial, TAXON, out)
+    assert len(out.getvalue().splitlines()) == len(samples) + 1
+    text = report.text_report(serial, TAXON, {t: 0 for t in TAXON}, COEF, paths)
+    assert text.count("Results for sample:") == len(samples)
+
+
+def test_batch_names_samples_by_base_name(tmp_path, population, monkeypatch):
+    index = PopulationIndex.from_population(population, TAXON)
+    run = tmp_path / "run.v2"
+    run.mkdir()
+    for name in ("a.txt", "b.txt", "a.csv"):
+        (run / name).write_text("\n".join(list(population)[:10]) + "\n")
+    monkeypatch.chdir(run)
+    results = batch.run_batch(index, ["./a.txt", "./b.txt"], TAXON, COEF, 1)
+    assert list(results) == ["a", "b"]
+    assert list(batch.run_batch(index, [str(run / "b.txt")], TAXON, COEF, 1)) == ["b"]
+    with pytest.raises(ValueError, match="'a'"):
+        batch.run_batch(index, ["./a.txt", str(run / "a.csv"), "./b.txt"], TAXON, COEF, 1)
+
+    (run / "pop.txt").write_text("Taxon: " + " ".join(TAXON) + "\n")
+    (run / "list.txt").write_text("a.txt\na.csv\n")
+    with pytest.raises(SystemExit, match="share the name"):
+        batch.main(["pop.txt", "a.txt", "a.csv"])
+    with pytest.raises(SystemExit, match="PhyRe.py: .*'a'"):
+        cli.main(["list.txt", "pop.txt", "5", "7", "-b", "y"])
+
+
+def test_euler_closed_form_matches_species_lists(population):
+    rng = random.Random(13)
+    taxon = list(TAXON)
+    for size in (3, 8, 40, 150):
+        for _ in range(5):
+            sample = rng.sample(list(population), size)
+            atd, taxonN, Taxon = reference_atd_mean(population, sample)
+            expected = reference_euler(sample, Taxon, atd)
+            result = euler(sample, Taxon, atd, taxon, COEF)
+            for key in ("EI", "TDmin", "TDmax"):
+                assert result[key] == pytest.approx(expected[key], nan_ok=True)
+    assert taxon == TAXON
+
+
+def test_funnel_cache_reuses_rows_per_dimension(tmp_path, population, monkeypatch):
+    store = cache.FunnelCache(str(tmp_path / "cache"))
+    rows = funnels.funnel(population, TAXON, COEF, p=30, d1=5, d2=8, seed=3, cache=store)
+    assert rows == funnels.funnel(population, TAXON, COEF, p=30, d1=5, d2=8, seed=3)
+
+    computed = []
+    scalar = funnels.METHODS["scalar"]
+    monkeypatch.setitem(funnels.METHODS, "scalar",
+                        lambda state, seed, d, *a: computed.append(d) or scalar(state, seed, d, *a))
+    longer = funnels.funnel(population, TAXON, COEF, p=30, d1=5, d2=10, seed=3, cache=store)
+    assert longer[:4] == rows and set(computed) == {9, 10}
+    other = funnels.funnel(population, TAXON, COEF, p=30, d1=5, d2=5, seed=4, cache=store)
+    assert other[0] != rows[0] and computed[-1] == 5
+
+    key = store.key(population, TAXON, COEF, 30, 3, "scalar", funnels.BATCH_SIZE)
+    assert store.get(key, 5) == rows[0]
+    store.max_bytes = os.path.getsize(store.path(key, 5))
+    store.evict()
+    assert [path for _, _, path in store.entries()] == [store.path(key, 5)]
+
+
+def test_cli_writes_report_and_funnel_like_phyre(tmp_path, population, monkeypatch):
+    write_population(tmp_path / "pop.txt", population)
+    (tmp_path / "run_a.txt").write_text("\n".join(list(population)[:25]) + "\n")
+    monkeypatch.chdir(tmp_path)
+    cli.main(["run_a.txt", "pop.txt", "5", "7", "-p", "20", "--seed", "2"])
+    text = (tmp_path / "run_a.out").read_text()
+    assert text.startswith("Output from Average Taxonomic Distinctness\n\nrun_a.txt\n")
+    assert "Dimension for this sample is 25 \n" in text
+    table = (tmp_path / "run_funnel.out").read_text().splitlines()
+    assert table[-4] == funnels.HEADER
+    rows = funnels.funnel(population, TAXON, path_lengths(population, TAXON)[0], p=20, d1=5, d2=7, seed=2)
+    assert table[-3:] == [funnels.format_row(row) for row in rows]
+
+
+def test_cli_funnel_resumes_from_checkpoint(tmp_path, population, monkeypatch):
+    write_population(tmp_path / "pop.txt", population)
+    (tmp_path / "s.txt").write_text("\n".join(list(population)[:12]) + "\n")
+    monkeypatch.chdir(tmp_path)
+    argv = ["s.txt", "pop.txt", "5", "9", "-p", "20"]
+
+    computed = []
+    scalar = funnels.METHODS["scalar"]
+
+    def preempted(state, seed, d, *a):
+        if d == 8:
+            raise KeyboardInterrupt
+        computed.append(d)
+        return scalar(state, seed, d, *a)
+
+    monkeypatch.setitem(funnels.METHODS, "scalar", preempted)
+    with pytest.raises(KeyboardInterrupt):
+        cli.main(argv)
+    partial = (tmp_path / "s_funnel.out").read_text().splitlines()
+    assert [int(line.split()[0]) for line in partial[-3:]] == [5, 6, 7]
+    assert (tmp_path / "s_funnel.out.ckpt").exists()
+
+    computed.clear()
+    monkeypatch.setitem(funnels.METHODS, "scalar", lambda state, seed, d, *a:
+                        computed.append(d) or scalar(state, seed, d, *a))
+    cli.main(argv)
+    table = (tmp_path / "s_funnel.out").read_text().splitlines()
+    assert table[:-2] == partial and set(computed) == {8, 9}
+    assert not (tmp_path / "s_funnel.out.ckpt").exists()
+
+
+def test_path_lengths_match_reference(population):
+    # inherited names (PhyRe's -m y) repeat the level above and are not new taxa
+    inherited = {s: dict(names) for s, names in population.items()}
+    for i, names in enumerate(inherited.values()):
+        if i % 4 == 0:
+            names["Order"] = names["Class"]
+    for pop in (population, inherited):
+        expected = reference_path_length(pop)
+        index = PopulationIndex.from_population(pop, TAXON)
+        for data in (pop, index):
+            coef, taxonN, lengths = path_lengths(data, TAXON)
+            assert taxonN == expected[1]
+            assert coef == pytest.approx(expected[0])
+            assert lengths == pytest.approx(expected[2])
@@ -1,27 +1,141 @@
 #!/usr/bin/env python3
-import sys
-
-current = None
-total = 0
-
-def flush(key, val):
-    if key is not None:
-        # Exact required format: “File name”: # of lines
-        print(f"{key}: {val}")
-
-for line in sys.stdin:
-    line = line.rstrip("\n")
-    if not line:
-        continue
-    key, _, val = line.partition("\t")
-    try:
-        n = int(val)
-    except ValueError:
-        continue
-    if key != current:
-        flush(current, total)
-        current, total = key, n
+# Line-count reducer for Hadoop Streaming. With --combine it is also the
+# job's combiner (-combiner "python3 reducer.py --combine"): it sums each map
+# task's sorted spill the same way but writes the mapper's "<key>\t<n>"
+# intermediate format, so the real reducer can combine its output again.
+# Keeping both in one file matters on the cluster: -files symlinks every
+# script from its own cache directory, so one script cannot import another.
+import argparse, json, operator, sys
+
+# --stats schema: mapper.py --stats emits these fields, in this order, after
+# the key; each one is combined associatively with the matching operator.
+STAT_FIELDS = ("lines", "bytes", "nonblank", "max_line", "defs", "classes")
+STAT_COMBINE = (operator.add, operator.add, operator.add, max, operator.add, operator.add)
+
+
+def parse(lines):
+    # "<key>\t<n>" records; blank or malformed lines are skipped.
+    for line in lines:
+        line = line.rstrip("\n")
+        if not line:
+            continue
+        key, _, val = line.partition("\t")
+        try:
+            n = int(val)
+        except ValueError:
+            continue
+        yield key, n
+
+
+def parse_stats(lines):
+    # "<key>\t<lines>\t<bytes>\t..." records, one int per STAT_FIELDS entry.
+    for line in lines:
+        key, *vals = line.rstrip("\n").split("\t")
+        if len(vals) != len(STAT_FIELDS):
+            continue
+        try:
+            yield key, tuple(map(int, vals))
+        except ValueError:
+            continue
+
+
+def combine_stats(a, b):
+    return tuple(op(x, y) for op, x, y in zip(STAT_COMBINE, a, b))
+
+
+def reduce_sorted(records, combine=operator.add):
+    # Streaming sum; needs identical keys to arrive next to each other.
+    current = None
+    total = 0
+    for key, n in records:
+        if key != current:
+            if current is not None:
+                yield current, total
+            current, total = key, n
+        else:
+            total = combine(total, n)
+    if current is not None:
+        yield current, total
+
+
+def reduce_hashed(records, sort=False, combine=operator.add):
+    # Sum into a dict and emit at end of stream, so input order does not
+    # matter (unsorted or several mapper outputs concatenated together).
+    # Memory grows with the number of distinct keys, e.g. file names.
+    totals = {}
+    for key, n in records:
+        totals[key] = combine(totals[key], n) if key in totals else n
+    return sorted(totals.items()) if sort else totals.items()
+
+
+def format_record(key, val):
+    return f"{key}\t{val}"
+
+
+def format_stats_record(key, vals):
+    return "\t".join([key, *map(str, vals)])
+
+
+def format_count(key, val):
+    # Exact required format: “File name”: # of lines
+    return f"{key}: {val}"
+
+
+def file_name(key):
+    # mapper keys are quoted: "myfile.py" -> myfile.py
+    if len(key) >= 2 and key[0] == key[-1] == '"':
+        return key[1:-1]
+    return key
+
+
+def format_stats_tsv(key, vals):
+    return "\t".join([file_name(key), *map(str, vals)])
+
+
+def format_stats_json(key, vals):
+    return json.dumps({"file": file_name(key), **dict(zip(STAT_FIELDS, vals))})
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Line-count reducer for Hadoop Streaming.")
+    parser.add_argument("--hash", action="store_true",
+                        help="aggregate in memory; input does not need to be sorted")
+    parser.add_argument("--sort", action="store_true",
+                        help="with --hash, emit keys in sorted order")
+    parser.add_argument("--stats", action="store_true",
+                        help="combine mapper.py --stats records instead of line counts")
+    parser.add_argument("--combine", action="store_true",
+                        help="run as the combiner: emit mapper-format records, not the report")
+    parser.add_argument("--format", choices=("tsv", "json"), default="tsv",
+                        help="--stats output: TSV in STAT_FIELDS order or JSON lines")
+    parser.add_argument("--header", action="store_true",
+                        help="with --stats --format tsv, print a column header first")
+    args = parser.parse_args(argv)
+    if args.sort and not args.hash:
+        parser.error("--sort only applies to --hash")
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.stats:
+        records, combine = parse_stats(sys.stdin), combine_stats
+        if args.combine:
+            fmt = format_stats_record
+        else:
+            fmt = format_stats_json if args.format == "json" else format_stats_tsv
+            if args.header and args.format == "tsv":
+                print("\t".join(("file",) + STAT_FIELDS))
+    else:
+        records, combine = parse(sys.stdin), operator.add
+        fmt = format_record if args.combine else format_count
+    if args.hash:
+        totals = reduce_hashed(records, args.sort, combine)
     else:
-        total += n
+        totals = reduce_sorted(records, combine)
+    for key, val in totals:
+        print(fmt(key, val))
+
 
-flush(current, total)
+if __name__ == "__main__":
+    main()
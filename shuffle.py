@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+# External merge sort for mapper output: a drop-in for `sort` between
+# mapper.py and reducer.py that keeps memory flat however large the input.
+#
+#   python3 mapper.py < f | python3 shuffle.py | python3 reducer.py
+#
+# Records are buffered into bounded in-memory runs; each full run is sorted
+# by key and spilled to a temp file, and the runs are k-way merged with
+# heapq.merge. More than `fan_in` runs are merged in several passes so the
+# number of open files stays bounded too.
+import argparse, heapq, os, sys, tempfile, zlib
+
+RUN_BYTES = 64 << 20   # in-memory run size before spilling
+FAN_IN = 128           # runs merged at once
+RECORD_OVERHEAD = 48   # approx. CPython cost of a small bytes object + list slot
+
+
+def record_key(line):
+    # Hadoop Streaming sorts on the key, i.e. everything before the first tab.
+    return line.split(b"\t", 1)[0]
+
+
+def partition(key, partitions):
+    # Which reducer gets `key`. crc32 is stable across processes and
+    # machines, unlike hash() on str/bytes.
+    return zlib.crc32(key) % partitions
+
+
+def spill(lines, tmpdir):
+    fd, path = tempfile.mkstemp(prefix="run-", dir=tmpdir)
+    with os.fdopen(fd, "wb") as f:
+        f.writelines(lines)
+    return path
+
+
+def sorted_runs(streams, tmpdir, run_bytes=RUN_BYTES):
+    # Returns (spilled run paths, last in-memory run). The last run is kept
+    # in memory so inputs that fit in one run never touch the disk.
+    runs, buf, size = [], [], 0
+    for stream in streams:
+        for line in stream:
+            if not line.endswith(b"\n"):
+                line += b"\n"
+            buf.append(line)
+            size += len(line) + RECORD_OVERHEAD
+            if size >= run_bytes:
+                buf.sort(key=record_key)
+                runs.append(spill(buf, tmpdir))
+                buf, size = [], 0
+    buf.sort(key=record_key)
+    return runs, buf
+
+
+def merge_files(paths):
+    files = [open(path, "rb") for path in paths]
+    try:
+        yield from heapq.merge(*files, key=record_key)
+    finally:
+        for f in files:
+            f.close()
+
+
+def reduce_fan_in(runs, tmpdir, fan_in=FAN_IN):
+    while len(runs) > fan_in:
+        merged = []
+        for i in range(0, len(runs), fan_in):
+            group = runs[i:i + fan_in]
+            merged.append(spill(merge_files(group), tmpdir))
+            for path in group:
+                os.remove(path)
+        runs = merged
+    return runs
+
+
+def external_sort(streams, out, tmpdir=None, run_bytes=RUN_BYTES, fan_in=FAN_IN):
+    with tempfile.TemporaryDirectory(prefix="shuffle-", dir=tmpdir) as tmp:
+        runs, last = sorted_runs(streams, tmp, run_bytes)
+        runs = reduce_fan_in(runs, tmp, max(fan_in - 1, 2))
+        files = [open(path, "rb") for path in runs]
+        try:
+            out.writelines(heapq.merge(*files, last, key=record_key))
+        finally:
+            for f in files:
+                f.close()
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Sort mapper output by key for reducer.py.")
+    parser.add_argument("inputs", nargs="*", help="mapper output files (default: stdin)")
+    parser.add_argument("--run-bytes", type=int, default=RUN_BYTES,
+                        help="in-memory run size before spilling to disk")
+    parser.add_argument("--fan-in", type=int, default=FAN_IN, help="runs merged at once")
+    parser.add_argument("--tmpdir", help="directory for spilled runs")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    files = [open(path, "rb") for path in args.inputs]
+    try:
+        streams = files or [sys.stdin.buffer]
+        external_sort(streams, sys.stdout.buffer, args.tmpdir, args.run_bytes, args.fan_in)
+    finally:
+        for f in files:
+            f.close()
+
+
+if __name__ == "__main__":
+    main()